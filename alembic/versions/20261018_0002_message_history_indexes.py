@@ -0,0 +1,36 @@
+"""partial indexes for channel history and thread expansion"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0002"
+down_revision = "20240701_0001"
+branch_labels = None
+depends_on = None
+
+LIVE_TOP_LEVEL = "deleted_at IS NULL AND parent_id IS NULL"
+LIVE_REPLY = "deleted_at IS NULL AND parent_id IS NOT NULL"
+
+
+def upgrade():
+    # CONCURRENTLY cannot run inside a transaction; avoids locking a large messages table
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_messages_channel_live",
+            "messages",
+            ["channel_id", "id"],
+            postgresql_where=sa.text(LIVE_TOP_LEVEL),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_messages_thread_live",
+            "messages",
+            ["parent_id", "id"],
+            postgresql_where=sa.text(LIVE_REPLY),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_messages_thread_live", table_name="messages", postgresql_concurrently=True)
+        op.drop_index("ix_messages_channel_live", table_name="messages", postgresql_concurrently=True)
@@ -0,0 +1,38 @@
+"""maintained published lesson totals on courses"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0003"
+down_revision = "20261018_0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "courses",
+        sa.Column("published_lessons_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "courses",
+        sa.Column("published_duration_sec", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        UPDATE courses SET
+            published_lessons_count = totals.lessons_count,
+            published_duration_sec = totals.duration_sec
+        FROM (
+            SELECT course_id, count(*) AS lessons_count, coalesce(sum(duration_sec), 0) AS duration_sec
+            FROM lessons
+            WHERE published
+            GROUP BY course_id
+        ) AS totals
+        WHERE totals.course_id = courses.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_column("courses", "published_duration_sec")
+    op.drop_column("courses", "published_lessons_count")
@@ -0,0 +1,45 @@
+"""per-user course progress aggregates and join indexes"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0004"
+down_revision = "20261018_0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "course_progress",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("course_id", sa.Integer(), sa.ForeignKey("courses.id"), primary_key=True),
+        sa.Column("completed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("percent", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_progress_lesson_id", "progress", ["lesson_id"])
+    op.create_index("ix_lessons_course_id", "lessons", ["course_id"])
+    # backfill; later kept current by every progress write and lesson publish
+    op.execute(
+        """
+        INSERT INTO course_progress (user_id, course_id, completed, total, percent, updated_at)
+        SELECT p.user_id, l.course_id,
+               sum(CASE WHEN p.status = 'done' THEN 1 ELSE 0 END) AS completed,
+               c.published_lessons_count,
+               CASE WHEN c.published_lessons_count > 0
+                    THEN sum(CASE WHEN p.status = 'done' THEN 1 ELSE 0 END) * 100 / c.published_lessons_count
+                    ELSE 0 END,
+               CURRENT_TIMESTAMP
+        FROM progress p
+        JOIN lessons l ON l.id = p.lesson_id AND l.published
+        JOIN courses c ON c.id = l.course_id
+        GROUP BY p.user_id, l.course_id, c.published_lessons_count
+        """
+    )
+
+
+def downgrade():
+    op.drop_index("ix_lessons_course_id", table_name="lessons")
+    op.drop_index("ix_progress_lesson_id", table_name="progress")
+    op.drop_table("course_progress")
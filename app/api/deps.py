@@ -1,12 +1,20 @@
-from fastapi import Depends, HTTPException, status
+from collections.abc import AsyncIterator
+import math
+
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import get_settings
 from app.core.security import TokenType, decode_token
+from app.db import session as session_module
 from app.db.deps import get_db
+from app.models.course import CourseVisibility
 from app.models.user import User, UserRole
+from app.services.consistency import reads_pinned_to_primary
+from app.services.principals import load_principal
 from app.services.redis import get_async_redis
-from app.utils.rate_limit import RateLimiter
+from app.utils.rate_limit import LocalRateLimitTier, RateLimiter, RateLimitResult
 
 auth_scheme = HTTPBearer(auto_error=False)
 _role_priority = {
@@ -17,31 +25,82 @@ _role_priority = {
 }
 
 
+_local_tier: LocalRateLimitTier | None = None
+
+
 def get_rate_limiter() -> RateLimiter:
     redis_conn = get_async_redis()
-    return RateLimiter(redis_conn)
+    return RateLimiter(redis_conn, algorithm=get_settings().rate_limit_algorithm)
+
+
+def get_local_rate_limit_tier() -> LocalRateLimitTier:
+    global _local_tier
+    if _local_tier is None:
+        settings = get_settings()
+        _local_tier = LocalRateLimitTier(
+            max_keys=settings.rate_limit_local_max_keys,
+            lease_size=settings.rate_limit_lease_size,
+            lease_ttl=settings.rate_limit_lease_ttl_seconds,
+        )
+    return _local_tier
 
 
-async def enforce_rate_limit(key: str, *, limit: int, window_seconds: int) -> None:
-    limiter = get_rate_limiter()
-    result = await limiter.check(key, limit, window_seconds)
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def rate_limit_headers(result: RateLimitResult) -> dict[str, str]:
+    headers = {
+        "RateLimit-Limit": str(result.limit),
+        "RateLimit-Remaining": str(result.remaining),
+        "RateLimit-Reset": str(math.ceil(result.reset_after)),
+    }
+    if not result.allowed:
+        headers["Retry-After"] = str(math.ceil(result.retry_after))
+    return headers
+
+
+async def enforce_rate_limit(
+    key: str,
+    *,
+    limit: int,
+    window_seconds: int,
+    response: Response | None = None,
+) -> None:
+    local_tier = get_local_rate_limit_tier()
+    result = local_tier.check(key, limit)
+    if result is None:
+        limiter = get_rate_limiter()
+        result = await limiter.check(key, limit, window_seconds, lease=local_tier.lease_for(key, limit))
+        local_tier.record(key, result)
+    headers = rate_limit_headers(result)
     if not result.allowed:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail={"retry_after": window_seconds, "remaining": result.remaining},
+            detail={"retry_after": math.ceil(result.retry_after), "remaining": result.remaining},
+            headers=headers,
         )
+    if response is not None:
+        response.headers.update(headers)
+
+
+def _access_payload(credentials: HTTPAuthorizationCredentials | None) -> dict | None:
+    if credentials is None:
+        return None
+    payload = decode_token(credentials.credentials)
+    if payload.get("type") != TokenType.ACCESS.value:
+        return None
+    return payload
 
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials | None = Depends(auth_scheme),
     db: AsyncSession = Depends(get_db),
 ) -> User:
-    if credentials is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    payload = decode_token(credentials.credentials)
-    if payload.get("type") != TokenType.ACCESS.value:
+    payload = _access_payload(credentials)
+    if payload is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    user = await db.get(User, int(payload["sub"]))
+    user = await load_principal(db, payload)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
     return user
@@ -51,12 +110,56 @@ async def get_optional_user(
     credentials: HTTPAuthorizationCredentials | None = Depends(auth_scheme),
     db: AsyncSession = Depends(get_db),
 ) -> User | None:
-    if credentials is None:
+    payload = _access_payload(credentials)
+    if payload is None:
         return None
-    payload = decode_token(credentials.credentials)
-    if payload.get("type") != TokenType.ACCESS.value:
+    return await load_principal(db, payload)
+
+
+def can_view_course(visibility: str, user: User | None) -> bool:
+    """Public courses are open to everyone; member courses need the member role or above."""
+
+    if visibility != CourseVisibility.MEMBER.value:
+        return True
+    return user is not None and _role_priority[user.role] >= _role_priority[UserRole.MEMBER]
+
+
+async def get_read_db(
+    credentials: HTTPAuthorizationCredentials | None = Depends(auth_scheme),
+) -> AsyncIterator[AsyncSession]:
+    """Session for read-only endpoints: the replica, unless the caller just wrote.
+
+    The caller is taken from the token alone, so choosing the session never
+    touches the primary; pair it with `get_optional_reader`/`require_reader_role`.
+    """
+
+    payload = _access_payload(credentials)
+    session_factory = session_module.ReadSessionLocal
+    if not session_module.has_replica() or (
+        payload is not None and await reads_pinned_to_primary(int(payload["sub"]))
+    ):
+        session_factory = session_module.SessionLocal
+    async with session_factory() as session:
+        yield session
+
+
+async def get_optional_reader(
+    credentials: HTTPAuthorizationCredentials | None = Depends(auth_scheme),
+    db: AsyncSession = Depends(get_read_db),
+) -> User | None:
+    """`get_optional_user` for read endpoints: the principal is loaded on the read session."""
+
+    payload = _access_payload(credentials)
+    if payload is None:
         return None
-    return await db.get(User, int(payload["sub"]))
+    on_primary = db.bind is session_module.engine
+    # only rows read from the primary may enter the principal cache
+    user = await load_principal(db, payload, cache_result=on_primary)
+    if user is None and not on_primary:
+        # a just-registered user may not have reached the replica yet
+        async with session_module.SessionLocal() as session:
+            user = await load_principal(session, payload)
+    return user
 
 
 def require_role(min_role: UserRole):
@@ -66,3 +169,16 @@ def require_role(min_role: UserRole):
         return user
 
     return dependency
+
+
+def require_reader_role(min_role: UserRole):
+    """`require_role` for endpoints reading through `get_read_db`."""
+
+    async def dependency(user: User | None = Depends(get_optional_reader)) -> User:
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+        if _role_priority[user.role] < _role_priority[min_role]:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+        return user
+
+    return dependency
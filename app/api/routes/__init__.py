@@ -1,3 +1,3 @@
-from app.api.routes import auth, chat, courses, invites, storage
+from app.api.routes import auth, chat, courses, invites, metrics, storage
 
-__all__ = ["auth", "chat", "courses", "invites", "storage"]
+__all__ = ["auth", "chat", "courses", "invites", "metrics", "storage"]
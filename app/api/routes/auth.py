@@ -1,32 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import enforce_rate_limit, get_db
+from app.api.deps import client_ip, enforce_rate_limit, get_db
 from app.crud import users as users_crud
 from app.core.security import (
     TokenType,
     create_access_token,
     create_refresh_token,
     decode_token,
-    get_password_hash,
-    verify_password,
 )
 from app.models.user import User
 from app.schemas.auth import LoginRequest, TokenPair, TokenRefreshRequest
 from app.schemas.user import UserCreate, UserRead
+from app.services.passwords import PasswordHasherBusy, get_password_hasher
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+def _hasher_busy(exc: PasswordHasherBusy) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(exc),
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/register", response_model=UserRead, status_code=status.HTTP_201_CREATED)
-async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)) -> User:
-    await enforce_rate_limit(f"register:{user_in.email}", limit=5, window_seconds=3600)
+async def register(
+    user_in: UserCreate,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    await enforce_rate_limit(f"register:ip:{client_ip(request)}", limit=50, window_seconds=3600)
+    await enforce_rate_limit(f"register:{user_in.email}", limit=5, window_seconds=3600, response=response)
 
     existing = await users_crud.get_by_email(db, user_in.email)
     if existing:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="email-exists")
     try:
-        password_hash = get_password_hash(user_in.password)
+        password_hash = await get_password_hasher().hash(user_in.password)
+    except PasswordHasherBusy as exc:
+        raise _hasher_busy(exc) from exc
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     user = await users_crud.create(
@@ -38,11 +53,25 @@ async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)) -> U
 
 
 @router.post("/login", response_model=TokenPair)
-async def login(body: LoginRequest, db: AsyncSession = Depends(get_db)) -> TokenPair:
-    await enforce_rate_limit(f"login:{body.email}", limit=10, window_seconds=300)
+async def login(
+    body: LoginRequest,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+) -> TokenPair:
+    await enforce_rate_limit(f"login:ip:{client_ip(request)}", limit=100, window_seconds=300)
+    await enforce_rate_limit(f"login:{body.email}", limit=10, window_seconds=300, response=response)
     user = await users_crud.get_by_email(db, body.email)
-    if not user or not verify_password(body.password, user.password_hash):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid")
+    try:
+        valid, new_hash = await get_password_hasher().verify_and_update(body.password, user.password_hash)
+    except PasswordHasherBusy as exc:
+        raise _hasher_busy(exc) from exc
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid")
+    if new_hash is not None:
+        await users_crud.update_password_hash(db, user, new_hash)
 
     return TokenPair(
         access=create_access_token(str(user.id)),
@@ -51,12 +80,13 @@ async def login(body: LoginRequest, db: AsyncSession = Depends(get_db)) -> Token
 
 
 @router.post("/refresh", response_model=TokenPair)
-async def refresh(payload: TokenRefreshRequest) -> TokenPair:
-    await enforce_rate_limit("refresh", limit=50, window_seconds=60)
+async def refresh(payload: TokenRefreshRequest, request: Request, response: Response) -> TokenPair:
+    await enforce_rate_limit(f"refresh:ip:{client_ip(request)}", limit=50, window_seconds=60)
     data = decode_token(payload.refresh)
     if data.get("type") != TokenType.REFRESH.value:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
     user_id = data["sub"]
+    await enforce_rate_limit(f"refresh:user:{user_id}", limit=10, window_seconds=60, response=response)
     return TokenPair(
         access=create_access_token(str(user_id)),
         refresh=create_refresh_token(str(user_id)),
@@ -1,19 +1,87 @@
 import asyncio
 from contextlib import suppress
 import json
+import logging
+from typing import Optional
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db, require_role
+from app.core.config import get_settings
+from app.core.metrics import metrics
 from app.core.security import decode_token
 from app.db import session as session_module
+from app.db.uow import ConnectionUnitOfWork
 from app.models.user import User, UserRole
-from app.schemas.chat import MessagePayload
-from app.services.chat import ChatBroker, create_message, get_or_create_channel, set_pin, soft_delete_message
+from app.schemas.chat import MessagePage, MessagePayload, MessageRead, MessageThreadRead
+from app.services.chat import (
+    DeferredBroker,
+    get_channel,
+    get_channel_registry,
+    list_messages,
+    list_replies,
+    resolve_channel,
+    set_pin,
+    soft_delete_message,
+)
+from app.services.fanout import SlowConsumer, get_channel_hub
+from app.services.ingest import get_message_ingestor
+from app.services.principals import load_principal
 from app.services.redis import get_async_redis
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(tags=["chat"])
 
+# application close codes sent to clients that cannot keep up with the channel
+SLOW_CONSUMER_CLOSE_CODE = 4429
+SEND_TIMEOUT_CLOSE_CODE = 4408
+
+slow_disconnects = metrics.counter("chat_hub.slow_disconnects")
+
+
+@router.get("/channels/{slug}/messages", response_model=MessagePage)
+async def channel_history(
+    slug: str,
+    before: Optional[int] = None,
+    limit: int = Query(default=50, ge=1, le=100),
+    parent_id: Optional[int] = None,
+    expand_threads: bool = False,
+    replies_limit: int = Query(default=20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    _: User = Depends(require_role(UserRole.USER)),
+):
+    channel = get_channel_registry().get(slug) or await get_channel(db, slug)
+    if channel is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    messages = await list_messages(
+        db,
+        channel_id=channel.id,
+        before=before,
+        limit=limit,
+        parent_id=parent_id,
+    )
+    replies = {}
+    if expand_threads and parent_id is None:
+        replies = await list_replies(
+            db,
+            parent_ids=[message.id for message in messages],
+            per_thread=replies_limit,
+        )
+    items = [
+        MessageThreadRead(
+            **MessageRead.model_validate(message).model_dump(),
+            replies=[MessageRead.model_validate(reply) for reply in replies.get(message.id, [])],
+        )
+        for message in messages
+    ]
+    next_cursor = items[-1].id if len(items) == limit else None
+    return MessagePage(items=items, next_cursor=next_cursor)
 
-async def authenticate(websocket: WebSocket) -> User:
+
+async def authenticate(websocket: WebSocket, uow: ConnectionUnitOfWork) -> User:
     token = websocket.query_params.get("token") or websocket.headers.get("authorization", "").replace("Bearer ", "")
     if not token:
         await websocket.close(code=4401)
@@ -22,8 +90,7 @@ async def authenticate(websocket: WebSocket) -> User:
     if payload.get("type") != "access":
         await websocket.close(code=4401)
         raise WebSocketDisconnect
-    async with session_module.SessionLocal() as session:
-        user = await session.get(User, int(payload["sub"]))
+    user = await load_principal(await uow.session(), payload)
     if not user:
         await websocket.close(code=4401)
         raise WebSocketDisconnect
@@ -33,66 +100,150 @@ async def authenticate(websocket: WebSocket) -> User:
 @router.websocket("/ws/channels/{slug}")
 async def websocket_endpoint(websocket: WebSocket, slug: str):
     await websocket.accept()
-    user = await authenticate(websocket)
-
-    async with session_module.SessionLocal() as session:
-        await get_or_create_channel(session, slug)
+    settings = get_settings()
+    uow = ConnectionUnitOfWork(session_module.SessionLocal, idle_timeout=settings.chat_session_idle_seconds)
+    try:
+        user = await authenticate(websocket, uow)
+        async with uow.transaction() as session:
+            # only admins open new channels; everyone else joins existing ones
+            channel = await resolve_channel(session, slug, create=user.role == UserRole.ADMIN)
+    except BaseException:
+        await uow.close()
+        raise
+    if channel is None:
+        await uow.close()
+        await websocket.close(code=4404)
+        return
 
-    redis = get_async_redis()
-    pubsub = redis.pubsub()
-    await pubsub.subscribe(f"channel:{slug}")
+    hub = get_channel_hub()
+    subscriber = await hub.subscribe(slug, user_id=user.id)
+    send_timeout = settings.chat_send_timeout_seconds
 
     async def reader():
+        close_code = None
         try:
-            async for message in pubsub.listen():
-                if message["type"] != "message":
-                    continue
-                await websocket.send_text(message["data"])
+            while True:
+                data = await subscriber.get()
+                await asyncio.wait_for(websocket.send_text(data), timeout=send_timeout)
+                subscriber.sent += 1
         except asyncio.CancelledError:
             pass
+        except SlowConsumer:
+            close_code = SLOW_CONSUMER_CLOSE_CODE
+        except asyncio.TimeoutError:
+            close_code = SEND_TIMEOUT_CLOSE_CODE
+        if close_code is not None:
+            slow_disconnects.inc()
+            with suppress(Exception):
+                await asyncio.wait_for(websocket.close(code=close_code), timeout=send_timeout)
+
+    frames: asyncio.Queue[str | None] = asyncio.Queue()
+
+    async def receiver():
+        try:
+            while True:
+                await frames.put(await websocket.receive_text())
+        finally:
+            # disconnect (or any receive error) ends the processing loop below
+            frames.put_nowait(None)
 
     reader_task = asyncio.create_task(reader())
-    broker = ChatBroker(redis)
+    receiver_task = asyncio.create_task(receiver())
+    broker = DeferredBroker(get_async_redis())
+    ingestor = get_message_ingestor()
+    ack_tasks: set[asyncio.Task] = set()
+
+    async def acknowledge(message: MessagePayload):
+        try:
+            event = await ingestor.submit(
+                channel_id=channel.id,
+                channel_slug=slug,
+                user_id=user.id,
+                payload=message,
+            )
+        except Exception:
+            logger.exception("chat message rejected")
+            reply = {"type": "message.error", "payload": {"client_id": message.client_id, "detail": "rejected"}}
+        else:
+            reply = {"type": "message.ack", "payload": {"client_id": message.client_id, "id": event["id"]}}
+        if message.client_id is not None:
+            # never subject to the fan-out overflow policy
+            subscriber.reply(json.dumps(reply))
+
+    async def apply(session: AsyncSession, event_type: str, payload: dict) -> None:
+        if event_type == "message.delete":
+            await soft_delete_message(
+                session,
+                broker,
+                message_id=payload["id"],
+                channel_slug=slug,
+                commit=False,
+            )
+        elif event_type == "message.pin":
+            if user.role not in (UserRole.ADMIN,):
+                return
+            await set_pin(
+                session,
+                broker,
+                message_id=payload["id"],
+                channel_slug=slug,
+                pinned=payload.get("pinned", True),
+                commit=False,
+            )
 
     try:
-        while True:
-            raw = await websocket.receive_text()
-            data = json.loads(raw)
-            event_type = data.get("type")
-            payload = data.get("payload", {})
-            async with session_module.SessionLocal() as session:
+        closing = False
+        while not closing:
+            raw = await frames.get()
+            if raw is None:
+                break
+            # frames that queued up while the last batch committed share one transaction
+            batch = [raw]
+            while len(batch) < settings.chat_frame_batch_size and not frames.empty():
+                raw = frames.get_nowait()
+                if raw is None:
+                    closing = True
+                    break
+                batch.append(raw)
+
+            mutations = []
+            for raw in batch:
+                data = json.loads(raw)
+                event_type = data.get("type")
+                payload = data.get("payload", {})
                 if event_type == "message.create":
-                    await create_message(
-                        session,
-                        broker,
-                        user_id=user.id,
-                        channel_slug=slug,
-                        payload=MessagePayload(**payload),
-                    )
-                elif event_type == "message.delete":
-                    await soft_delete_message(
-                        session,
-                        broker,
-                        message_id=payload["id"],
-                        channel_slug=slug,
-                    )
-                elif event_type == "message.pin":
-                    if user.role not in (UserRole.ADMIN,):
-                        continue
-                    await set_pin(
-                        session,
-                        broker,
-                        message_id=payload["id"],
-                        channel_slug=slug,
-                        pinned=payload.get("pinned", True),
-                    )
-    except WebSocketDisconnect:
-        reader_task.cancel()
-    except Exception:
-        reader_task.cancel()
-        raise
+                    if channel.is_readonly:
+                        raise PermissionError("channel-readonly")
+                    # the receive loop keeps reading while the batch commits
+                    task = asyncio.create_task(acknowledge(MessagePayload(**payload)))
+                    ack_tasks.add(task)
+                    task.add_done_callback(ack_tasks.discard)
+                elif event_type in ("message.delete", "message.pin"):
+                    mutations.append((event_type, payload))
+            if not mutations:
+                continue
+
+            try:
+                async with uow.transaction() as session:
+                    for event_type, payload in mutations:
+                        try:
+                            await apply(session, event_type, payload)
+                        except ValueError as exc:
+                            subscriber.reply(
+                                json.dumps({"type": "message.error", "payload": {"id": payload.get("id"), "detail": str(exc)}})
+                            )
+            except BaseException:
+                broker.discard()
+                raise
+            await broker.flush()
     finally:
-        with suppress(asyncio.CancelledError):
-            await reader_task
-        await pubsub.unsubscribe(f"channel:{slug}")
-        await pubsub.close()
+        receiver_task.cancel()
+        reader_task.cancel()
+        for task in (receiver_task, reader_task):
+            with suppress(asyncio.CancelledError, WebSocketDisconnect):
+                await task
+        hub.unsubscribe(subscriber)
+        # messages already accepted are still committed after the sender leaves
+        if ack_tasks:
+            await asyncio.gather(*ack_tasks, return_exceptions=True)
+        await uow.close()
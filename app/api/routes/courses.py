@@ -1,9 +1,19 @@
-from typing import Optional
+from datetime import timedelta
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db, get_optional_user, require_role
+from app.api.deps import (
+    can_view_course,
+    get_db,
+    get_optional_reader,
+    get_optional_user,
+    get_read_db,
+    require_reader_role,
+    require_role,
+)
+from app.core.config import get_settings
 from app.crud import courses as courses_crud
 from app.crud import progress as progress_crud
 from app.models.course import CourseVisibility
@@ -11,21 +21,30 @@ from app.models.user import User, UserRole
 from app.schemas.course import (
     CourseCreate,
     CourseDetail,
+    CourseLessonRead,
+    CoursePage,
     CourseRead,
     LessonCreate,
     LessonRead,
+    MyCourseRead,
     ProgressRead,
 )
-from app.schemas.progress import ProgressMarkRequest, ProgressResponse
+from app.schemas.progress import ProgressBatchRequest, ProgressBatchResponse, ProgressMarkRequest, ProgressResponse
+from app.services.catalog import bump_catalog_version, get_catalog_cache, if_none_match
+from app.services.consistency import pin_reads_to_primary
+from app.services.progress_buffer import get_progress_buffer
+from app.services.storage import generate_presigned_urls
 
 router = APIRouter(prefix="", tags=["courses"])
 
 
-@router.get("/courses", response_model=dict)
+@router.get("/courses", response_model=CoursePage)
 async def list_courses(
     visibility: Optional[str] = Query(default=None),
     limit: int = Query(default=10, le=50),
     cursor: Optional[int] = None,
+    if_none_match_header: Optional[str] = Header(default=None, alias="If-None-Match"),
+    # misses render from the primary: a lagging replica would pin stale pages under the new version
     db: AsyncSession = Depends(get_db),
     user: Optional[User] = Depends(get_optional_user),
 ):
@@ -33,53 +52,83 @@ async def list_courses(
     if user and user.role in (UserRole.MEMBER, UserRole.ADMIN):
         allowed_visibilities.append(CourseVisibility.MEMBER.value)
 
-    result = await courses_crud.list_courses(
-        db,
+    cache = get_catalog_cache()
+    key = cache.key(
+        await cache.version(),
+        visibilities=allowed_visibilities,
+        visibility=visibility,
         cursor=cursor,
         limit=limit,
-        visibility=visibility,
-        allowed_visibilities=allowed_visibilities,
     )
-    items = [
-        CourseRead(
-            id=course.id,
-            title=course.title,
-            slug=course.slug,
-            visibility=course.visibility,
-            cover_url=course.cover_url,
-            lessons_count=count,
+    etag = cache.etag(key)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match(if_none_match_header, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    async def render() -> str:
+        courses = await courses_crud.list_courses(
+            db,
+            cursor=cursor,
+            limit=limit,
+            visibility=visibility,
+            allowed_visibilities=allowed_visibilities,
         )
-        for course, count in result
-    ]
-    next_cursor = items[-1].id if items else None
-    return {"items": items, "next_cursor": next_cursor}
+        items = [
+            CourseRead(
+                id=course.id,
+                title=course.title,
+                slug=course.slug,
+                visibility=course.visibility,
+                cover_url=course.cover_url,
+                lessons_count=course.published_lessons_count,
+                duration_sec=course.published_duration_sec,
+            )
+            for course in courses
+        ]
+        next_cursor = items[-1].id if items else None
+        return CoursePage(items=items, next_cursor=next_cursor).model_dump_json()
+
+    body = await cache.get_or_render(key, render)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.get("/courses/{slug}", response_model=CourseDetail)
 async def get_course(
     slug: str,
-    db: AsyncSession = Depends(get_db),
-    user: Optional[User] = Depends(get_optional_user),
+    signed_urls: bool = Query(default=False, description="embed presigned URLs for the cover and lesson content"),
+    db: AsyncSession = Depends(get_read_db),
+    user: Optional[User] = Depends(get_optional_reader),
 ):
-    course = await courses_crud.get_by_slug(db, slug)
-    if course is None:
+    if signed_urls and user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    detail = await courses_crud.get_course_detail(db, slug, user_id=user.id if user else None)
+    if detail is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    course, lessons = detail
 
-    if course.visibility == CourseVisibility.MEMBER.value and (
-        not user or user.role not in (UserRole.MEMBER, UserRole.ADMIN)
-    ):
+    if not can_view_course(course.visibility, user):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
-    lessons = await courses_crud.list_published_lessons(db, course.id)
+    if user and lessons and get_settings().progress_buffered:
+        await get_progress_buffer().overlay(user.id, lessons)
 
     progress_percent = None
-    if user:
-        total = len(lessons)
-        if total:
-            completed = await progress_crud.count_completed_for_course(
-                db, course_id=course.id, user_id=user.id
+    if user and lessons:
+        completed = sum(1 for lesson in lessons if lesson["status"] == "done")
+        progress_percent = int((completed / len(lessons)) * 100)
+
+    cover_signed_url = None
+    if signed_urls:
+        try:
+            urls = generate_presigned_urls(
+                [lesson["content_url"] for lesson in lessons] + ([course.cover_url] if course.cover_url else []),
+                timedelta(minutes=5),
             )
-            progress_percent = int((completed / total) * 100)
+        except Exception as exc:  # pragma: no cover - minio-specific
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+        for lesson in lessons:
+            lesson["signed_url"] = urls[lesson["content_url"]]
+        cover_signed_url = urls.get(course.cover_url) if course.cover_url else None
 
     response = CourseDetail(
         course=CourseRead(
@@ -89,18 +138,47 @@ async def get_course(
             visibility=course.visibility,
             cover_url=course.cover_url,
             lessons_count=len(lessons),
+            duration_sec=course.published_duration_sec,
         ),
-        lessons=[LessonRead.model_validate(lesson) for lesson in lessons],
-        progress=ProgressRead(percent=progress_percent or 0) if progress_percent is not None else None,
+        lessons=[CourseLessonRead(**lesson) for lesson in lessons],
+        progress=ProgressRead(percent=progress_percent) if progress_percent is not None else None,
+        cover_signed_url=cover_signed_url,
     )
     return response
 
 
+@router.get("/me/courses", response_model=List[MyCourseRead])
+async def my_courses(
+    limit: int = Query(default=20, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    user: User = Depends(require_reader_role(UserRole.USER)),
+):
+    rows = await progress_crud.list_course_progress(db, user_id=user.id, limit=limit)
+    return [
+        MyCourseRead(
+            course=CourseRead(
+                id=course.id,
+                title=course.title,
+                slug=course.slug,
+                visibility=course.visibility,
+                cover_url=course.cover_url,
+                lessons_count=course.published_lessons_count,
+                duration_sec=course.published_duration_sec,
+            ),
+            completed=progress.completed,
+            total=progress.total,
+            percent=progress.percent,
+            updated_at=progress.updated_at,
+        )
+        for progress, course in rows
+    ]
+
+
 @router.post("/admin/courses", response_model=CourseRead, status_code=status.HTTP_201_CREATED)
 async def create_course(
     payload: CourseCreate,
     db: AsyncSession = Depends(get_db),
-    _: User = Depends(require_role(UserRole.ADMIN)),
+    admin: User = Depends(require_role(UserRole.ADMIN)),
 ):
     course = await courses_crud.create_course(
         db,
@@ -109,6 +187,8 @@ async def create_course(
         visibility=payload.visibility,
         cover_url=payload.cover_url,
     )
+    await bump_catalog_version()
+    await pin_reads_to_primary(admin.id)
     return CourseRead(
         id=course.id,
         title=course.title,
@@ -123,7 +203,7 @@ async def create_course(
 async def create_lesson(
     payload: LessonCreate,
     db: AsyncSession = Depends(get_db),
-    _: User = Depends(require_role(UserRole.ADMIN)),
+    admin: User = Depends(require_role(UserRole.ADMIN)),
 ):
     lesson = await courses_crud.create_lesson(
         db,
@@ -134,20 +214,38 @@ async def create_lesson(
         duration_sec=payload.duration_sec,
         published=payload.published,
     )
+    await bump_catalog_version()
+    await pin_reads_to_primary(admin.id)
     return LessonRead.model_validate(lesson)
 
 
+async def _write_progress(db: AsyncSession, user: User, items: list[tuple[int, str, int]]) -> int:
+    if get_settings().progress_buffered:
+        # heartbeats land in Redis; the flusher writes them in bulk
+        return await get_progress_buffer().record(user.id, items)
+    try:
+        updated = await progress_crud.upsert_progress_many(db, user_id=user.id, items=items)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+    await pin_reads_to_primary(user.id)
+    return updated
+
+
 @router.post("/progress/mark", response_model=ProgressResponse)
 async def mark_progress(
     payload: ProgressMarkRequest,
     db: AsyncSession = Depends(get_db),
     user: User = Depends(require_role(UserRole.USER)),
 ):
-    await progress_crud.upsert_progress(
-        db,
-        user_id=user.id,
-        lesson_id=payload.lesson_id,
-        status=payload.status,
-        percent=payload.percent,
-    )
+    await _write_progress(db, user, [(payload.lesson_id, payload.status, payload.percent)])
     return ProgressResponse()
+
+
+@router.post("/progress/batch", response_model=ProgressBatchResponse)
+async def mark_progress_batch(
+    payload: ProgressBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_role(UserRole.USER)),
+):
+    updated = await _write_progress(db, user, [(item.lesson_id, item.status, item.percent) for item in payload.items])
+    return ProgressBatchResponse(updated=updated)
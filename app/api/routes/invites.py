@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.deps import get_db, require_role
 from app.models.user import User, UserRole
 from app.schemas.invite import InviteCreate, InviteRead, InviteRedeemRequest
+from app.services.consistency import pin_reads_to_primary
 from app.services.invites import create_invite, redeem_invite
 
 router = APIRouter(tags=["invites"])
@@ -45,4 +46,5 @@ async def redeem(
         new_role = await redeem_invite(db, code=payload.code, user=user)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    await pin_reads_to_primary(user.id)
     return {"role": new_role.value}
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+
+from app.api.deps import require_role
+from app.core.metrics import metrics
+from app.models.user import User, UserRole
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/admin/metrics", response_model=dict)
+async def read_metrics(_: User = Depends(require_role(UserRole.ADMIN))):
+    return metrics.snapshot()
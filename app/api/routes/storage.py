@@ -1,12 +1,13 @@
 from datetime import timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.concurrency import run_in_threadpool
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import require_role
+from app.api.deps import can_view_course, get_read_db, require_reader_role, require_role
+from app.crud import courses as courses_crud
 from app.models.user import User, UserRole
-from app.schemas.storage import SignedUrlResponse
-from app.services.storage import generate_presigned_url
+from app.schemas.storage import SignBatchRequest, SignedUrlBatchResponse, SignedUrlResponse
+from app.services.storage import generate_presigned_url, generate_presigned_urls
 
 router = APIRouter(prefix="/storage", tags=["storage"])
 
@@ -17,7 +18,31 @@ async def sign_url(
     _: User = Depends(require_role(UserRole.USER)),
 ):
     try:
-        url = await run_in_threadpool(generate_presigned_url, key, timedelta(minutes=5))
+        url = generate_presigned_url(key, timedelta(minutes=5))
     except Exception as exc:  # pragma: no cover - minio-specific
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     return SignedUrlResponse(url=url)
+
+
+@router.post("/sign-batch", response_model=SignedUrlBatchResponse)
+async def sign_batch(
+    payload: SignBatchRequest,
+    db: AsyncSession = Depends(get_read_db),
+    user: User = Depends(require_reader_role(UserRole.USER)),
+):
+    """Sign many assets of one course; access is checked once for the whole batch."""
+
+    assets = await courses_crud.get_course_assets(db, payload.course_slug)
+    if assets is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    course, allowed_keys = assets
+    if not can_view_course(course.visibility, user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    foreign = sorted(set(payload.keys) - allowed_keys)
+    if foreign:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"not assets of this course: {foreign}")
+    try:
+        urls = generate_presigned_urls(payload.keys, timedelta(minutes=5))
+    except Exception as exc:  # pragma: no cover - minio-specific
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return SignedUrlBatchResponse(urls=urls)
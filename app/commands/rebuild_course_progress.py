@@ -0,0 +1,40 @@
+"""Rebuild the `course_progress` aggregates from `progress`.
+
+Run after a backfill or bulk import that bypassed the progress CRUD. The
+courses' published lesson totals are recomputed from `lessons` first, so
+lesson imports are covered too:
+
+    python -m app.commands.rebuild_course_progress            # every course
+    python -m app.commands.rebuild_course_progress --course 3 --course 7
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import select
+
+from app.crud import courses as courses_crud
+from app.crud import progress as progress_crud
+from app.db import session as session_module
+from app.models.course import Course
+
+
+async def rebuild(course_ids: list[int] | None) -> None:
+    async with session_module.SessionLocal() as session:
+        for course_id in course_ids or (await session.scalars(select(Course.id))).all():
+            await courses_crud.refresh_published_totals(session, course_id)
+        await progress_crud.rebuild_course_progress(session, course_ids=course_ids)
+    await session_module.engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--course", dest="course_ids", type=int, action="append", help="limit to a course id (repeatable)")
+    args = parser.parse_args()
+    asyncio.run(rebuild(args.course_ids))
+    scope = ", ".join(map(str, args.course_ids)) if args.course_ids else "all courses"
+    print(f"course_progress rebuilt for {scope}")
+
+
+if __name__ == "__main__":
+    main()
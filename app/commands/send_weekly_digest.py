@@ -0,0 +1,39 @@
+"""Render and enqueue this week's digest emails.
+
+Safe to rerun: each week keeps a checkpoint, so a crashed run resumes where it
+stopped and a finished one sends nothing new.
+
+    python -m app.commands.send_weekly_digest
+    python -m app.commands.send_weekly_digest --week 2026-W42 --restart
+"""
+
+import argparse
+import asyncio
+
+from app.db import session as session_module
+from app.services.digest import checkpoint_key, current_week, run_weekly_digest
+from app.services.redis import get_async_redis
+
+
+async def send(week: str, batch_size: int, restart: bool) -> None:
+    if restart:
+        await get_async_redis().delete(checkpoint_key(week))
+    run = await run_weekly_digest(week=week, batch_size=batch_size)
+    await session_module.engine.dispose()
+    print(
+        f"weekly digest {run.week}: resumed after user {run.resumed_after}, "
+        f"scanned {run.users_scanned} users, enqueued {run.emails_enqueued} emails"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--week", default=current_week(), help="ISO week, e.g. 2026-W42 (default: current)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first user")
+    args = parser.parse_args()
+    asyncio.run(send(args.week, args.batch_size, args.restart))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from bisect import bisect_left
+from threading import Lock
+from typing import Any, Callable, Dict, Sequence
+
+DEFAULT_BUCKETS_MS: tuple[float, ...] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Counter:
+    """Monotonic in-process counter."""
+
+    def __init__(self) -> None:
+        self.value = 0
+        self._lock = Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> int:
+        return self.value
+
+
+class Histogram:
+    """Fixed-bucket histogram (upper bounds inclusive, last bucket is +Inf)."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS_MS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.total += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "buckets": dict(zip(bounds, self.counts)),
+        }
+
+
+class MetricsRegistry:
+    """Process-local registry backing `GET /admin/metrics`."""
+
+    def __init__(self) -> None:
+        self._counters: Dict[str, Counter] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._gauges: Dict[str, Callable[[], Any]] = {}
+
+    def counter(self, name: str) -> Counter:
+        if name not in self._counters:
+            self._counters[name] = Counter()
+        return self._counters[name]
+
+    def histogram(self, name: str, buckets: Sequence[float] = DEFAULT_BUCKETS_MS) -> Histogram:
+        if name not in self._histograms:
+            self._histograms[name] = Histogram(buckets)
+        return self._histograms[name]
+
+    def gauge(self, name: str, func: Callable[[], Any]) -> None:
+        """Register a callback evaluated lazily on every snapshot."""
+
+        self._gauges[name] = func
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "counters": {name: counter.snapshot() for name, counter in sorted(self._counters.items())},
+            "histograms": {name: hist.snapshot() for name, hist in sorted(self._histograms.items())},
+            "gauges": {name: func() for name, func in sorted(self._gauges.items())},
+        }
+
+
+metrics = MetricsRegistry()
@@ -1,11 +1,16 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from enum import Enum
+import hashlib
+import json
+import time
 from typing import Any, Dict
 
 import bcrypt
 import jwt
+from jwt.algorithms import get_default_algorithms
 
-from app.core.config import get_settings
+from app.core.config import Settings, get_settings
 
 
 class TokenType(str, Enum):
@@ -13,8 +18,98 @@ class TokenType(str, Enum):
     REFRESH = "refresh"
 
 
+class _KeyRing:
+    """Key objects parsed once from settings, plus extra verification keys by `kid`.
+
+    `JWT_VERIFY_KEYS` holds previous keys (JSON object `{kid: key}`) so tokens
+    signed before a rotation stay valid until they expire.
+    """
+
+    def __init__(self, settings: Settings):
+        self.algorithm = settings.jwt_alg
+        algorithm = get_default_algorithms()[self.algorithm]
+        self.kid = settings.jwt_kid
+        self.signing_key = algorithm.prepare_key(settings.jwt_secret)
+        self.primary = self._verification_key(algorithm, settings.jwt_public_key or settings.jwt_secret)
+        self.keys = {
+            kid: self._verification_key(algorithm, key)
+            for kid, key in json.loads(settings.jwt_verify_keys or "{}").items()
+        }
+        if self.kid:
+            self.keys[self.kid] = self.primary
+
+    @staticmethod
+    def _verification_key(algorithm: Any, key: str) -> Any:
+        prepared = algorithm.prepare_key(key)
+        # asymmetric private keys verify with their public half
+        public_key = getattr(prepared, "public_key", None)
+        return public_key() if callable(public_key) else prepared
+
+    def verification_key(self, token: str) -> Any:
+        if not self.keys:
+            return self.primary
+        kid = jwt.get_unverified_header(token).get("kid")
+        return self.keys.get(kid, self.primary)
+
+
+class _VerifiedTokenCache:
+    """LRU of already-verified payloads keyed by token digest, honouring `exp`."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, digest: bytes) -> Dict[str, Any] | None:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        exp, payload = entry
+        if exp <= time.time():
+            del self._entries[digest]
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        self._entries.move_to_end(digest)
+        return dict(payload)
+
+    def put(self, digest: bytes, payload: Dict[str, Any]) -> None:
+        if self.max_size <= 0 or "exp" not in payload:
+            return
+        self._entries[digest] = (float(payload["exp"]), dict(payload))
+        self._entries.move_to_end(digest)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_keyring: _KeyRing | None = None
+_token_cache: _VerifiedTokenCache | None = None
+
+
+def _get_keyring() -> _KeyRing:
+    global _keyring
+    if _keyring is None:
+        _keyring = _KeyRing(get_settings())
+    return _keyring
+
+
+def _get_token_cache() -> _VerifiedTokenCache:
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = _VerifiedTokenCache(get_settings().jwt_decode_cache_size)
+    return _token_cache
+
+
+def reset_token_state() -> None:
+    """Drop preloaded keys and cached payloads (call after changing JWT settings)."""
+
+    global _keyring, _token_cache
+    _keyring = None
+    _token_cache = None
+
+
 def _create_token(sub: str, token_type: TokenType, expires_delta: timedelta) -> str:
-    settings = get_settings()
+    keyring = _get_keyring()
     now = datetime.now(timezone.utc)
     payload: Dict[str, Any] = {
         "sub": sub,
@@ -22,7 +117,8 @@ def _create_token(sub: str, token_type: TokenType, expires_delta: timedelta) ->
         "iat": int(now.timestamp()),
         "exp": int((now + expires_delta).timestamp()),
     }
-    return jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_alg)
+    headers = {"kid": keyring.kid} if keyring.kid else None
+    return jwt.encode(payload, keyring.signing_key, algorithm=keyring.algorithm, headers=headers)
 
 
 def create_access_token(sub: str) -> str:
@@ -44,15 +140,24 @@ def create_refresh_token(sub: str) -> str:
 
 
 def decode_token(token: str) -> Dict[str, Any]:
-    settings = get_settings()
-    return jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_alg])
-
-
-def get_password_hash(password: str) -> str:
+    cache = _get_token_cache()
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = cache.get(digest)
+    if payload is not None:
+        return payload
+    keyring = _get_keyring()
+    payload = jwt.decode(token, keyring.verification_key(token), algorithms=[keyring.algorithm])
+    cache.put(digest, payload)
+    return payload
+
+
+def get_password_hash(password: str, rounds: int | None = None) -> str:
     password_bytes = password.encode("utf-8")
     if len(password_bytes) > 72:
         raise ValueError("password-too-long")
-    return bcrypt.hashpw(password_bytes, bcrypt.gensalt()).decode("utf-8")
+    if rounds is None:
+        rounds = get_settings().bcrypt_rounds
+    return bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds=rounds)).decode("utf-8")
 
 
 def verify_password(password: str, password_hash: str) -> bool:
@@ -60,3 +165,14 @@ def verify_password(password: str, password_hash: str) -> bool:
         return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
     except ValueError:
         return False
+
+
+def password_needs_rehash(password_hash: str, rounds: int | None = None) -> bool:
+    """Return True when the stored hash was produced with a different cost factor."""
+
+    if rounds is None:
+        rounds = get_settings().bcrypt_rounds
+    try:
+        return int(password_hash.split("$")[2]) != rounds
+    except (IndexError, ValueError):
+        return True
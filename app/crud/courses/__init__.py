@@ -1,7 +1,11 @@
-from sqlalchemy import func, select
+from typing import Any
+
+from sqlalchemy import and_, func, null, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.crud import progress as progress_crud
 from app.models.course import Course, Lesson
+from app.models.progress import LessonProgress
 
 
 async def list_courses(
@@ -11,22 +15,15 @@ async def list_courses(
     limit: int,
     visibility: str | None,
     allowed_visibilities: list[str],
-):
-    stmt = (
-        select(Course, func.count(Lesson.id).label("lessons_count"))
-        .join(Lesson, Lesson.course_id == Course.id, isouter=True)
-        .group_by(Course.id)
-        .order_by(Course.id)
-        .limit(limit)
-    )
+) -> list[Course]:
+    stmt = select(Course).order_by(Course.id).limit(limit)
     if cursor:
         stmt = stmt.where(Course.id > cursor)
     if visibility:
         stmt = stmt.where(Course.visibility == visibility)
     else:
         stmt = stmt.where(Course.visibility.in_(allowed_visibilities))
-    result = await db.execute(stmt)
-    return result.all()
+    return (await db.scalars(stmt)).all()
 
 
 async def get_by_slug(db: AsyncSession, slug: str) -> Course | None:
@@ -39,6 +36,65 @@ async def list_published_lessons(db: AsyncSession, course_id: int):
     return (await db.scalars(stmt)).all()
 
 
+async def get_course_detail(
+    db: AsyncSession,
+    slug: str,
+    *,
+    user_id: int | None,
+) -> tuple[Course, list[dict[str, Any]]] | None:
+    """Course, its published lessons and the user's progress on each, in one query.
+
+    Lessons come back as plain column dicts (plus `status`/`percent`, None when
+    untracked): building ORM objects for hundreds of lessons costs more than the
+    query itself. Returns None for an unknown slug.
+    """
+
+    if user_id is None:
+        progress_status, progress_percent = null(), null()
+    else:
+        progress_status, progress_percent = LessonProgress.status, LessonProgress.percent
+    stmt = (
+        select(Course, *Lesson.__table__.c, progress_status.label("status"), progress_percent.label("percent"))
+        .outerjoin(Lesson, and_(Lesson.course_id == Course.id, Lesson.published.is_(True)))
+        .where(Course.slug == slug)
+        .order_by(Lesson.index)
+    )
+    if user_id is not None:
+        stmt = stmt.outerjoin(
+            LessonProgress,
+            and_(LessonProgress.lesson_id == Lesson.id, LessonProgress.user_id == user_id),
+        )
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        return None
+    course = rows[0].Course
+    lessons = []
+    for row in rows:
+        lesson = dict(row._mapping)
+        del lesson["Course"]
+        if lesson["id"] is not None:
+            lessons.append(lesson)
+    return course, lessons
+
+
+async def get_course_assets(db: AsyncSession, slug: str) -> tuple[Course, set[str]] | None:
+    """Course plus the storage keys it exposes: its cover and published lesson content."""
+
+    stmt = (
+        select(Course, Lesson.content_url)
+        .outerjoin(Lesson, and_(Lesson.course_id == Course.id, Lesson.published.is_(True)))
+        .where(Course.slug == slug)
+    )
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        return None
+    course = rows[0].Course
+    keys = {row.content_url for row in rows if row.content_url}
+    if course.cover_url:
+        keys.add(course.cover_url)
+    return course, keys
+
+
 async def create_course(
     db: AsyncSession,
     *,
@@ -78,6 +134,46 @@ async def create_lesson(
         published=published,
     )
     db.add(lesson)
+    if published:
+        await _adjust_published_totals(db, course_id, lessons=1, duration_sec=duration_sec or 0)
+        await progress_crud.refresh_course_totals(db, course_id)
     await db.commit()
     await db.refresh(lesson)
     return lesson
+
+
+async def _adjust_published_totals(db: AsyncSession, course_id: int, *, lessons: int, duration_sec: int) -> None:
+    """Apply a delta to the course's published totals in the lesson write's transaction.
+
+    Lesson edits that publish, unpublish or change a published lesson's duration
+    must call this with the difference, followed by
+    `progress_crud.refresh_course_totals`. Writes that bypass it are repaired by
+    `refresh_published_totals` (run from `app.commands.rebuild_course_progress`).
+    """
+
+    await db.execute(
+        update(Course)
+        .where(Course.id == course_id)
+        .values(
+            published_lessons_count=Course.published_lessons_count + lessons,
+            published_duration_sec=Course.published_duration_sec + duration_sec,
+        )
+    )
+
+
+async def refresh_published_totals(db: AsyncSession, course_id: int) -> None:
+    """Recompute the course's published totals from its lessons."""
+
+    totals = (
+        select(
+            func.count(Lesson.id),
+            func.coalesce(func.sum(Lesson.duration_sec), 0),
+        )
+        .where(Lesson.course_id == course_id, Lesson.published.is_(True))
+    )
+    count, duration = (await db.execute(totals)).one()
+    await db.execute(
+        update(Course)
+        .where(Course.id == course_id)
+        .values(published_lessons_count=count, published_duration_sec=duration)
+    )
@@ -1,27 +1,145 @@
-from sqlalchemy import func, select
+from datetime import datetime
+import json
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import DateTime, Insert, Select, and_, case, delete, func, literal, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.course import Lesson
-from app.models.progress import LessonProgress
+from app.db.upsert import dialect_insert
+from app.models.course import Course, Lesson
+from app.models.progress import CourseProgress, LessonProgress
+
+
+def merge_progress(items: Iterable[tuple[int, str, int]]) -> Dict[int, tuple[str, int]]:
+    """Collapse updates per lesson: highest percent wins, `done` is sticky and counts as 100%."""
+
+    merged: Dict[int, tuple[str, int]] = {}
+    for lesson_id, status, percent in items:
+        if lesson_id in merged:
+            prev_status, prev_percent = merged[lesson_id]
+            status = "done" if "done" in (status, prev_status) else status
+            percent = max(percent, prev_percent)
+        merged[lesson_id] = (status, 100 if status == "done" else percent)
+    return merged
+
+
+def _percent_of(completed, total):
+    return case((total > 0, completed * 100 // total), else_=0)
 
 
-async def count_completed_for_course(
+def _apply_course_deltas(db: AsyncSession, changed) -> Insert:
+    """Fold changed `(user_id, lesson_id, status)` rows into `course_progress`.
+
+    Every changed `done` row is a lesson that has just been completed, so it adds
+    one to `completed`; other changed rows only mark the course as active. Only
+    the touched (user, course) rows are written, nothing is re-aggregated.
+    """
+
+    completed = func.sum(case((changed.c.status == "done", 1), else_=0))
+    total = Course.published_lessons_count
+    deltas = (
+        select(
+            changed.c.user_id,
+            Lesson.course_id,
+            completed,
+            total,
+            _percent_of(completed, total),
+            literal(datetime.utcnow(), DateTime),
+        )
+        .select_from(changed)
+        .join(Lesson, and_(Lesson.id == changed.c.lesson_id, Lesson.published.is_(True)))
+        .join(Course, Course.id == Lesson.course_id)
+        .where(True)  # SQLite needs a WHERE to parse INSERT ... SELECT ... ON CONFLICT
+        .group_by(changed.c.user_id, Lesson.course_id, total)
+    )
+    stmt = dialect_insert(db, CourseProgress).from_select(
+        ["user_id", "course_id", "completed", "total", "percent", "updated_at"],
+        deltas,
+    )
+    new_completed = CourseProgress.completed + stmt.excluded.completed
+    return stmt.on_conflict_do_update(
+        index_elements=[CourseProgress.user_id, CourseProgress.course_id],
+        set_={
+            "completed": new_completed,
+            "total": stmt.excluded.total,
+            "percent": _percent_of(new_completed, stmt.excluded.total),
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+
+
+async def upsert_progress_rows(db: AsyncSession, rows: List[Dict[str, Any]], *, commit: bool = True) -> None:
+    """Write `{user_id, lesson_id, status, percent}` rows and their `course_progress` deltas.
+
+    Updates are monotonic, so out-of-order or concurrent heartbeats cannot move
+    a lesson backwards; a `done` lesson is final at 100%. Updates that would
+    change nothing are skipped, so the upsert's RETURNING lists exactly the rows
+    that changed, and a returned `done` row is a fresh completion. On Postgres the
+    upsert and the aggregate deltas are one statement (a data-modifying CTE).
+    Rows must be unique per (user, lesson). Raises ValueError("lesson-missing")
+    for an unknown lesson.
+    """
+
+    if not rows:
+        return
+    rows = [{**row, "percent": 100} if row["status"] == "done" else row for row in rows]
+    stmt = dialect_insert(db, LessonProgress).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LessonProgress.user_id, LessonProgress.lesson_id],
+        set_={
+            "percent": case(
+                (stmt.excluded.percent > LessonProgress.percent, stmt.excluded.percent),
+                else_=LessonProgress.percent,
+            ),
+            "status": stmt.excluded.status,
+        },
+        where=and_(
+            LessonProgress.status != "done",
+            or_(stmt.excluded.percent > LessonProgress.percent, stmt.excluded.status == "done"),
+        ),
+    ).returning(LessonProgress.user_id, LessonProgress.lesson_id, LessonProgress.status)
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            changed = stmt.cte("changed_progress")
+            await db.execute(_apply_course_deltas(db, changed).add_cte(changed))
+        else:
+            # SQLite has no data-modifying CTEs: feed the returned rows back as JSON
+            returned = [list(row) for row in await db.execute(stmt)]
+            if returned:
+                entries = func.json_each(json.dumps(returned)).table_valued("value").alias("changed_progress")
+                changed = select(
+                    func.json_extract(entries.c.value, "$[0]").label("user_id"),
+                    func.json_extract(entries.c.value, "$[1]").label("lesson_id"),
+                    func.json_extract(entries.c.value, "$[2]").label("status"),
+                ).subquery("changed_progress")
+                await db.execute(_apply_course_deltas(db, changed))
+        if commit:
+            await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise ValueError("lesson-missing") from exc
+
+
+async def upsert_progress_many(
     db: AsyncSession,
     *,
-    course_id: int,
     user_id: int,
+    items: Iterable[tuple[int, str, int]],
+    commit: bool = True,
 ) -> int:
-    stmt = (
-        select(func.count())
-        .select_from(LessonProgress)
-        .join(Lesson, Lesson.id == LessonProgress.lesson_id)
-        .where(
-            Lesson.course_id == course_id,
-            LessonProgress.user_id == user_id,
-            LessonProgress.status == "done",
-        )
+    """Merge one user's `(lesson_id, status, percent)` updates and upsert them together."""
+
+    merged = merge_progress(items)
+    await upsert_progress_rows(
+        db,
+        [
+            {"user_id": user_id, "lesson_id": lesson_id, "status": status, "percent": percent}
+            for lesson_id, (status, percent) in merged.items()
+        ],
+        commit=commit,
     )
-    return await db.scalar(stmt) or 0
+    return len(merged)
 
 
 async def upsert_progress(
@@ -31,22 +149,94 @@ async def upsert_progress(
     lesson_id: int,
     status: str,
     percent: int,
-) -> LessonProgress:
-    stmt = select(LessonProgress).where(
-        LessonProgress.user_id == user_id,
-        LessonProgress.lesson_id == lesson_id,
-    )
-    record = await db.scalar(stmt)
-    if record:
-        record.status = status
-        record.percent = percent
-    else:
-        record = LessonProgress(
-            user_id=user_id,
-            lesson_id=lesson_id,
-            status=status,
-            percent=percent,
+) -> None:
+    await upsert_progress_many(db, user_id=user_id, items=[(lesson_id, status, percent)])
+
+
+async def recompute_course_progress(
+    db: AsyncSession,
+    *,
+    user_ids: Iterable[int] | None = None,
+    course_ids: Iterable[int] | Select | None = None,
+) -> None:
+    """Upsert `course_progress` rows for the given users/courses by regrouping `progress`.
+
+    Only published lessons count. Progress writes maintain the aggregate with
+    deltas instead; this full pass backs `rebuild_course_progress`.
+    """
+
+    completed = func.sum(case((LessonProgress.status == "done", 1), else_=0))
+    total = Course.published_lessons_count
+    totals = (
+        select(
+            LessonProgress.user_id,
+            Lesson.course_id,
+            completed,
+            total,
+            _percent_of(completed, total),
+            literal(datetime.utcnow(), DateTime),
         )
-    db.add(record)
+        .join(Lesson, and_(Lesson.id == LessonProgress.lesson_id, Lesson.published.is_(True)))
+        .join(Course, Course.id == Lesson.course_id)
+        .where(True)  # SQLite needs a WHERE to parse INSERT ... SELECT ... ON CONFLICT
+        .group_by(LessonProgress.user_id, Lesson.course_id, total)
+    )
+    if user_ids is not None:
+        totals = totals.where(LessonProgress.user_id.in_(user_ids))
+    if course_ids is not None:
+        totals = totals.where(Lesson.course_id.in_(course_ids))
+    stmt = dialect_insert(db, CourseProgress).from_select(
+        ["user_id", "course_id", "completed", "total", "percent", "updated_at"],
+        totals,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CourseProgress.user_id, CourseProgress.course_id],
+        set_={
+            "completed": stmt.excluded.completed,
+            "total": stmt.excluded.total,
+            "percent": stmt.excluded.percent,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def refresh_course_totals(db: AsyncSession, course_id: int) -> None:
+    """Re-apply a course's published lesson count to every learner's aggregate."""
+
+    total = select(Course.published_lessons_count).where(Course.id == course_id).scalar_subquery()
+    await db.execute(
+        update(CourseProgress)
+        .where(CourseProgress.course_id == course_id)
+        .values(total=total, percent=_percent_of(CourseProgress.completed, total))
+    )
+
+
+async def rebuild_course_progress(db: AsyncSession, *, course_ids: Iterable[int] | None = None) -> None:
+    """Recreate `course_progress` from scratch (for all courses or only `course_ids`)."""
+
+    stmt = delete(CourseProgress)
+    if course_ids is not None:
+        course_ids = list(course_ids)
+        stmt = stmt.where(CourseProgress.course_id.in_(course_ids))
+    await db.execute(stmt)
+    await recompute_course_progress(db, course_ids=course_ids)
     await db.commit()
-    return record
+
+
+async def list_course_progress(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    limit: int,
+) -> list[tuple[CourseProgress, Course]]:
+    """The user's courses with progress, most recently active first."""
+
+    stmt = (
+        select(CourseProgress, Course)
+        .join(Course, Course.id == CourseProgress.course_id)
+        .where(CourseProgress.user_id == user_id)
+        .order_by(CourseProgress.updated_at.desc(), CourseProgress.course_id)
+        .limit(limit)
+    )
+    return (await db.execute(stmt)).all()
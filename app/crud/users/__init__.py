@@ -23,3 +23,10 @@ async def create(
     await db.commit()
     await db.refresh(user)
     return user
+
+
+async def update_password_hash(db: AsyncSession, user: User, password_hash: str) -> User:
+    user.password_hash = password_hash
+    db.add(user)
+    await db.commit()
+    return user
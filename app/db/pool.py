@@ -0,0 +1,34 @@
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.metrics import metrics
+
+checkout_wait_ms = metrics.histogram("db.pool.checkout_wait_ms", (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000, 5000))
+overflow_events = metrics.counter("db.pool.overflow_events")
+checkout_timeouts = metrics.counter("db.pool.checkout_timeouts")
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait for a connection.
+
+    Every checkout feeds `db.pool.checkout_wait_ms`; opening a connection beyond
+    `pool_size` counts as an overflow event and giving up after `pool_timeout`
+    counts as a checkout timeout. A steady stream of either means the pool is
+    undersized for the worker's concurrency.
+    """
+
+    def _do_get(self):
+        overflow_before = self._overflow
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            checkout_timeouts.inc()
+            raise
+        finally:
+            checkout_wait_ms.observe((time.perf_counter() - started) * 1000)
+        if self._overflow > max(overflow_before, 0):
+            overflow_events.inc()
+        return conn
@@ -1,23 +1,90 @@
+from typing import Any, Dict
+from uuid import uuid4
+
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
-from app.core.config import get_settings
+from app.core.config import Settings, get_settings
+from app.core.metrics import metrics
+from app.db.pool import InstrumentedAsyncPool
+
+
+def _engine_options(settings: Settings, database_url: str) -> Dict[str, Any]:
+    """Pool and driver options for `create_async_engine`.
+
+    Pool sizing only applies to server databases; SQLite keeps SQLAlchemy's
+    defaults. With `DB_PGBOUNCER` asyncpg never reuses named prepared statements,
+    which transaction-pooling PgBouncer cannot route back to the same backend.
+    """
+
+    url = make_url(database_url)
+    if url.get_backend_name() != "postgresql":
+        return {}
+    options: Dict[str, Any] = {
+        "poolclass": InstrumentedAsyncPool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if url.get_driver_name() == "asyncpg":
+        connect_args: Dict[str, Any] = {"prepared_statement_cache_size": settings.db_statement_cache_size}
+        if settings.db_pgbouncer:
+            connect_args.update(
+                statement_cache_size=0,
+                prepared_statement_cache_size=0,
+                prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+            )
+        options["connect_args"] = connect_args
+    return options
+
+
+def _session_factory(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(bind=engine, expire_on_commit=False, autoflush=False, future=True)
 
 
 def _create_engine() -> tuple[AsyncEngine, async_sessionmaker[AsyncSession]]:
     settings = get_settings()
-    engine = create_async_engine(settings.database_url)
-    session_factory = async_sessionmaker(
-        bind=engine, expire_on_commit=False, autoflush=False, future=True
-    )
-    return engine, session_factory
+    engine = create_async_engine(settings.database_url, **_engine_options(settings, settings.database_url))
+    return engine, _session_factory(engine)
+
+
+def _create_read_engine() -> tuple[AsyncEngine, async_sessionmaker[AsyncSession]]:
+    """Engine for read-only traffic; falls back to the primary without a replica URL."""
+
+    settings = get_settings()
+    replica_url = settings.database_replica_url
+    if not replica_url:
+        return engine, SessionLocal
+    read_engine = create_async_engine(replica_url, **_engine_options(settings, replica_url))
+    return read_engine, _session_factory(read_engine)
 
 
 engine, SessionLocal = _create_engine()
+read_engine, ReadSessionLocal = _create_read_engine()
+
+
+def has_replica() -> bool:
+    return read_engine is not engine
+
+
+def _pool_stat(name: str) -> Any:
+    stat = getattr(engine.pool, name, None)
+    return stat() if callable(stat) else None
+
+
+metrics.gauge("db.pool.checked_out", lambda: _pool_stat("checkedout"))
+metrics.gauge("db.pool.idle", lambda: _pool_stat("checkedin"))
+metrics.gauge("db.pool.overflow", lambda: _pool_stat("overflow"))
 
 
 def reset_engine() -> None:
     """Recreate engine + session factory (useful for tests)."""
 
-    global engine, SessionLocal
+    global engine, SessionLocal, read_engine, ReadSessionLocal
+    if has_replica():
+        read_engine.sync_engine.dispose()
     engine.sync_engine.dispose()
     engine, SessionLocal = _create_engine()
+    read_engine, ReadSessionLocal = _create_read_engine()
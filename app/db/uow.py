@@ -0,0 +1,79 @@
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import metrics
+
+checkout_wait_ms = metrics.histogram("db.ws_checkout_wait_ms", (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000))
+
+
+class ConnectionUnitOfWork:
+    """Session owned by one long-lived connection (e.g. a WebSocket).
+
+    The same `AsyncSession` is reused across transactions instead of being
+    rebuilt per frame. A pooled DB connection is only held inside
+    `transaction()`: committing hands it back to the pool, so an idle socket
+    pins nothing. After `idle_timeout` seconds without use the session itself
+    is closed as well, dropping its identity map.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], *, idle_timeout: float):
+        self.session_factory = session_factory
+        self.idle_timeout = idle_timeout
+        self._session: AsyncSession | None = None
+        self._idle_handle: asyncio.TimerHandle | None = None
+        self._in_use = 0
+
+    async def session(self) -> AsyncSession:
+        """Return the connection's session without opening a transaction."""
+
+        self._cancel_idle_timer()
+        if self._session is None:
+            self._session = self.session_factory()
+        return self._session
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[AsyncSession]:
+        session = await self.session()
+        self._in_use += 1
+        try:
+            started = time.perf_counter()
+            await session.connection()
+            checkout_wait_ms.observe((time.perf_counter() - started) * 1000)
+            try:
+                yield session
+                await session.commit()
+            except BaseException:
+                await session.rollback()
+                raise
+            finally:
+                # other connections may change these rows; never serve them stale next time
+                session.expunge_all()
+        finally:
+            self._in_use -= 1
+            self._schedule_idle_close()
+
+    def _schedule_idle_close(self) -> None:
+        self._cancel_idle_timer()
+        if self._in_use or self._session is None:
+            return
+        loop = asyncio.get_running_loop()
+        self._idle_handle = loop.call_later(self.idle_timeout, lambda: asyncio.create_task(self._close_if_idle()))
+
+    def _cancel_idle_timer(self) -> None:
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+
+    async def _close_if_idle(self) -> None:
+        if not self._in_use:
+            await self.close()
+
+    async def close(self) -> None:
+        self._cancel_idle_timer()
+        session, self._session = self._session, None
+        if session is not None:
+            await session.close()
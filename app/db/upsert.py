@@ -0,0 +1,10 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def dialect_insert(db: AsyncSession, table):
+    """Return an `insert()` for the session's dialect, so `on_conflict_*` is available."""
+
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
@@ -4,15 +4,28 @@ import uuid
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api.routes import auth, chat, courses, invites, storage
+from app.api.routes import auth, chat, courses, invites, metrics, storage
 from app.core.config import get_settings
 from app.core.logging import configure_logging
+from app.services.fanout import get_channel_hub
+from app.services.ingest import get_message_ingestor
+from app.services.invalidation import invalidation_bus
+from app.services.notifications import warm_templates
+from app.services.passwords import shutdown_password_hasher
+from app.services.progress_buffer import get_progress_buffer
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     configure_logging()
+    warm_templates()
+    await invalidation_bus.start()
     yield
+    await get_progress_buffer().close()
+    await get_message_ingestor().close()
+    await get_channel_hub().close()
+    await invalidation_bus.stop()
+    shutdown_password_hasher()
 
 
 settings = get_settings()
@@ -41,3 +54,4 @@ app.include_router(courses.router)
 app.include_router(storage.router)
 app.include_router(invites.router)
 app.include_router(chat.router)
+app.include_router(metrics.router)
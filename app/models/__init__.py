@@ -3,7 +3,7 @@ from app.models.chat import Channel, Message
 from app.models.course import Course, Lesson
 from app.models.invite import Invite
 from app.models.profile import Profile
-from app.models.progress import LessonProgress
+from app.models.progress import CourseProgress, LessonProgress
 from app.models.user import User, UserRole
 
 __all__ = [
@@ -14,6 +14,7 @@ __all__ = [
     "Lesson",
     "Invite",
     "Profile",
+    "CourseProgress",
     "LessonProgress",
     "User",
     "UserRole",
@@ -5,9 +5,11 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     JSON,
     String,
+    text,
 )
 from sqlalchemy.orm import relationship
 
@@ -24,8 +26,30 @@ class Channel(Base):
     messages = relationship("Message", back_populates="channel")
 
 
+_LIVE_TOP_LEVEL = text("deleted_at IS NULL AND parent_id IS NULL")
+_LIVE_REPLY = text("deleted_at IS NULL AND parent_id IS NOT NULL")
+
+
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # history pages: newest live top-level messages of a channel, keyset on id
+        Index(
+            "ix_messages_channel_live",
+            "channel_id",
+            "id",
+            postgresql_where=_LIVE_TOP_LEVEL,
+            sqlite_where=_LIVE_TOP_LEVEL,
+        ),
+        # thread expansion: live replies of a parent, in order
+        Index(
+            "ix_messages_thread_live",
+            "parent_id",
+            "id",
+            postgresql_where=_LIVE_REPLY,
+            sqlite_where=_LIVE_REPLY,
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     channel_id = Column(Integer, ForeignKey("channels.id"), nullable=False)
@@ -19,6 +19,9 @@ class Course(Base):
     slug = Column(String(255), nullable=False, unique=True, index=True)
     visibility = Column(String(20), default=CourseVisibility.PUBLIC.value, nullable=False)
     cover_url = Column(String(512), nullable=True)
+    # maintained by courses_crud on every lesson write so the catalog never aggregates
+    published_lessons_count = Column(Integer, nullable=False, default=0, server_default="0")
+    published_duration_sec = Column(Integer, nullable=False, default=0, server_default="0")
 
     lessons = relationship("Lesson", back_populates="course", cascade="all, delete")
 
@@ -27,7 +30,7 @@ class Lesson(Base):
     __tablename__ = "lessons"
 
     id = Column(Integer, primary_key=True)
-    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, index=True)
     index = Column(Integer, nullable=False)
     title = Column(String(255), nullable=False)
     content_url = Column(String(512), nullable=False)
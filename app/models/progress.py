@@ -1,4 +1,6 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, UniqueConstraint
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, UniqueConstraint
 
 from app.db.base import Base
 
@@ -9,6 +11,19 @@ class LessonProgress(Base):
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    lesson_id = Column(Integer, ForeignKey("lessons.id"), nullable=False)
+    lesson_id = Column(Integer, ForeignKey("lessons.id"), nullable=False, index=True)
     status = Column(String(32), default="in_progress", nullable=False)
     percent = Column(Integer, default=0, nullable=False)
+
+
+class CourseProgress(Base):
+    """Per-user course totals, kept in step with `progress` and lesson publishing."""
+
+    __tablename__ = "course_progress"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), primary_key=True)
+    completed = Column(Integer, default=0, nullable=False)
+    total = Column(Integer, default=0, nullable=False)
+    percent = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -8,6 +8,8 @@ class MessagePayload(BaseModel):
     text: str = Field(max_length=2000)
     parent_id: Optional[int] = None
     attachments: List[dict] = Field(default_factory=list)
+    # echoed back in a `message.ack` frame once the message is committed
+    client_id: Optional[str] = Field(default=None, max_length=64)
 
 
 class ChatEvent(BaseModel):
@@ -27,3 +29,12 @@ class MessageRead(BaseModel):
     pinned: bool
     deleted_at: Optional[datetime]
     created_at: datetime
+
+
+class MessageThreadRead(MessageRead):
+    replies: List[MessageRead] = Field(default_factory=list)
+
+
+class MessagePage(BaseModel):
+    items: List[MessageThreadRead]
+    next_cursor: Optional[int] = None
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import List, Optional
 
 from pydantic import BaseModel
@@ -15,6 +16,17 @@ class LessonRead(BaseModel):
     published: bool
 
 
+class CourseLessonRead(LessonRead):
+    """Published lesson with the caller's progress (absent for guests or untouched lessons).
+
+    `signed_url` is only filled in for `GET /courses/{slug}?signed_urls=true`.
+    """
+
+    status: str | None = None
+    percent: int | None = None
+    signed_url: str | None = None
+
+
 class LessonCreate(BaseModel):
     course_id: int
     index: int
@@ -44,9 +56,24 @@ class CourseRead(CourseBase):
 
     id: int
     lessons_count: int
+    duration_sec: int = 0
+
+
+class CoursePage(BaseModel):
+    items: List[CourseRead]
+    next_cursor: Optional[int] = None
 
 
 class CourseDetail(BaseModel):
     course: CourseRead
-    lessons: List[LessonRead]
+    lessons: List[CourseLessonRead]
     progress: Optional[ProgressRead] = None
+    cover_signed_url: Optional[str] = None
+
+
+class MyCourseRead(BaseModel):
+    course: CourseRead
+    completed: int
+    total: int
+    percent: int
+    updated_at: datetime
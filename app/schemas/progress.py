@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import BaseModel, Field
 
 
@@ -7,5 +9,13 @@ class ProgressMarkRequest(BaseModel):
     percent: int = Field(ge=0, le=100)
 
 
+class ProgressBatchRequest(BaseModel):
+    items: List[ProgressMarkRequest] = Field(min_length=1, max_length=500)
+
+
 class ProgressResponse(BaseModel):
     ok: bool = True
+
+
+class ProgressBatchResponse(ProgressResponse):
+    updated: int
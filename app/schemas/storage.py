@@ -1,3 +1,5 @@
+from typing import Dict, List
+
 from pydantic import BaseModel, Field
 
 
@@ -7,3 +9,12 @@ class SignUrlQuery(BaseModel):
 
 class SignedUrlResponse(BaseModel):
     url: str
+
+
+class SignBatchRequest(BaseModel):
+    course_slug: str = Field(min_length=1)
+    keys: List[str] = Field(min_length=1, max_length=500)
+
+
+class SignedUrlBatchResponse(BaseModel):
+    urls: Dict[str, str]
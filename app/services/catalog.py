@@ -0,0 +1,121 @@
+from collections import OrderedDict
+import hashlib
+import time
+from typing import Awaitable, Callable, Iterable
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.services.invalidation import invalidation_bus
+from app.services.redis import get_async_redis
+
+CATALOG_TOPIC = "catalog"
+CATALOG_VERSION_KEY = "catalog:version"
+
+
+class CatalogCache:
+    """Cache of serialized `GET /courses` pages, keyed by the page inputs plus a version.
+
+    Bodies live in Redis (shared by all workers) and in a small per-process LRU.
+    Any catalog write bumps `catalog:version`, which makes every older key
+    unreachable instead of deleting them one by one; stale pages simply expire.
+    The version itself is held in-process, refreshed over the invalidation bus
+    and re-read from Redis at most every `version_check_seconds`.
+    """
+
+    def __init__(self, *, max_local: int, ttl_seconds: int, version_check_seconds: float):
+        self.max_local = max_local
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+        self._local: "OrderedDict[str, str]" = OrderedDict()
+        self._version: int | None = None
+        self._version_checked_at = 0.0
+        self.local_hits = metrics.counter("catalog_cache.local_hits")
+        self.redis_hits = metrics.counter("catalog_cache.redis_hits")
+        self.misses = metrics.counter("catalog_cache.misses")
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+    async def version(self) -> int:
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked_at >= self.version_check_seconds:
+            self.set_version(int(await get_async_redis().get(CATALOG_VERSION_KEY) or 0))
+            self._version_checked_at = now
+        return self._version
+
+    def set_version(self, version: int) -> None:
+        if self._version is None or version > self._version:
+            self._version = version
+            # keys carry the version, so older entries can never be hit again
+            self._local.clear()
+
+    def key(self, version: int, *, visibilities: Iterable[str], visibility: str | None, cursor: int | None, limit: int) -> str:
+        scope = ",".join(sorted(visibilities))
+        return f"catalog:v{version}:{scope}:{visibility or '*'}:{cursor or 0}:{limit}"
+
+    @staticmethod
+    def etag(key: str) -> str:
+        # the key fully determines the body, so the ETag needs no body hashing
+        return f'"{hashlib.blake2b(key.encode(), digest_size=8).hexdigest()}"'
+
+    async def get_or_render(self, key: str, render: Callable[[], Awaitable[str]]) -> str:
+        body = self._local.get(key)
+        if body is not None:
+            self._local.move_to_end(key)
+            self.local_hits.inc()
+            return body
+        redis = get_async_redis()
+        body = await redis.get(key)
+        if body is not None:
+            self.redis_hits.inc()
+        else:
+            self.misses.inc()
+            body = await render()
+            await redis.set(key, body, ex=self.ttl_seconds)
+        self._remember(key, body)
+        return body
+
+    def _remember(self, key: str, body: str) -> None:
+        if self.max_local <= 0:
+            return
+        self._local[key] = body
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_local:
+            self._local.popitem(last=False)
+
+
+_cache: CatalogCache | None = None
+
+
+def get_catalog_cache() -> CatalogCache:
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = CatalogCache(
+            max_local=settings.catalog_cache_local_size,
+            ttl_seconds=settings.catalog_cache_ttl_seconds,
+            version_check_seconds=settings.catalog_version_check_seconds,
+        )
+        metrics.gauge("catalog_cache.local_size", lambda: len(get_catalog_cache()))
+    return _cache
+
+
+def _on_invalidate(key: str) -> None:
+    get_catalog_cache().set_version(int(key))
+
+
+invalidation_bus.register(CATALOG_TOPIC, _on_invalidate)
+
+
+async def bump_catalog_version() -> int:
+    """Invalidate every cached catalog page in all workers; call after a catalog write."""
+
+    version = await get_async_redis().incr(CATALOG_VERSION_KEY)
+    await invalidation_bus.publish(CATALOG_TOPIC, version)
+    return version
+
+
+def if_none_match(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    return header.strip() == "*" or etag in {tag.strip().removeprefix("W/") for tag in header.split(",")}
@@ -1,12 +1,18 @@
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime
 import json
+from typing import Dict
 
 from redis.asyncio import Redis as AsyncRedis
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.db.upsert import dialect_insert
 from app.models.chat import Channel, Message
-from app.schemas.chat import MessagePayload
+from app.services.invalidation import invalidation_bus
 
 
 class ChatBroker:
@@ -18,52 +24,185 @@ class ChatBroker:
         await self.redis.publish(f"channel:{channel_slug}", json.dumps(message))
 
 
-async def get_or_create_channel(db: AsyncSession, slug: str) -> Channel:
-    stmt = select(Channel).where(Channel.slug == slug)
-    channel = await db.scalar(stmt)
-    if channel:
-        return channel
+class DeferredBroker(ChatBroker):
+    """Buffer events until the surrounding transaction commits, then send them in one pipeline."""
 
-    channel = Channel(slug=slug, is_readonly=slug == "announcements")
-    db.add(channel)
-    await db.commit()
-    await db.refresh(channel)
-    return channel
+    def __init__(self, redis_client: AsyncRedis):
+        super().__init__(redis_client)
+        self._pending: list[tuple[str, str]] = []
+
+    async def publish(self, channel_slug: str, event: str, payload: dict) -> None:
+        self._pending.append((f"channel:{channel_slug}", json.dumps({"type": event, "payload": payload})))
+
+    def discard(self) -> None:
+        self._pending.clear()
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for channel, message in self._pending:
+            pipe.publish(channel, message)
+        self._pending.clear()
+        await pipe.execute()
+
+
+@dataclass(frozen=True)
+class ChannelInfo:
+    id: int
+    slug: str
+    is_readonly: bool
+
+
+class ChannelRegistry:
+    """Process-local, size-bounded LRU of slug -> channel metadata.
+
+    Channels are created once and almost never change, so after the first
+    resolve the chat hot path never queries `channels`. Changes are broadcast
+    through the invalidation bus (see `invalidate_channel`).
+    """
+
+    def __init__(self, *, max_size: int) -> None:
+        self.max_size = max_size
+        self._channels: "OrderedDict[str, ChannelInfo]" = OrderedDict()
+        self.evictions = metrics.counter("chat.channels_evicted")
+
+    def get(self, slug: str) -> ChannelInfo | None:
+        info = self._channels.get(slug)
+        if info is not None:
+            self._channels.move_to_end(slug)
+        return info
+
+    def put(self, info: ChannelInfo) -> None:
+        if self.max_size <= 0:
+            return
+        self._channels[info.slug] = info
+        self._channels.move_to_end(info.slug)
+        while len(self._channels) > self.max_size:
+            self._channels.popitem(last=False)
+            self.evictions.inc()
+
+    def invalidate(self, slug: str) -> None:
+        self._channels.pop(slug, None)
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+
+CHANNEL_TOPIC = "channel"
+_registry: ChannelRegistry | None = None
+
+
+def get_channel_registry() -> ChannelRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ChannelRegistry(max_size=get_settings().chat_channel_registry_size)
+        metrics.gauge("chat.channels_cached", lambda: len(get_channel_registry()))
+    return _registry
+
+
+def _on_invalidate(slug: str) -> None:
+    get_channel_registry().invalidate(slug)
+
+
+invalidation_bus.register(CHANNEL_TOPIC, _on_invalidate)
 
 
-async def create_message(
+async def resolve_channel(db: AsyncSession, slug: str, *, create: bool = False) -> ChannelInfo | None:
+    """Return channel metadata, or None for an unknown slug; cached per process.
+
+    With `create` a missing channel is created first; only callers allowed to
+    create channels may pass it.
+    """
+
+    registry = get_channel_registry()
+    info = registry.get(slug)
+    if info is not None:
+        return info
+
+    stmt = select(Channel.id, Channel.is_readonly).where(Channel.slug == slug)
+    row = (await db.execute(stmt)).first()
+    if row is None:
+        if not create:
+            return None
+        # concurrent first joins race here; ON CONFLICT lets every one of them win
+        await db.execute(
+            dialect_insert(db, Channel)
+            .values(slug=slug, is_readonly=slug == "announcements")
+            .on_conflict_do_nothing(index_elements=[Channel.slug])
+        )
+        await db.commit()
+        row = (await db.execute(stmt)).one()
+    info = ChannelInfo(id=row.id, slug=slug, is_readonly=row.is_readonly)
+    registry.put(info)
+    return info
+
+
+async def invalidate_channel(slug: str) -> None:
+    """Drop cached metadata for a channel in every worker; call after changing it."""
+
+    await invalidation_bus.publish(CHANNEL_TOPIC, slug)
+
+
+async def get_channel(db: AsyncSession, slug: str) -> Channel | None:
+    return await db.scalar(select(Channel).where(Channel.slug == slug))
+
+
+async def list_messages(
     db: AsyncSession,
-    broker: ChatBroker,
     *,
-    user_id: int,
-    channel_slug: str,
-    payload: MessagePayload,
-) -> Message:
-    channel = await get_or_create_channel(db, channel_slug)
-    if channel.is_readonly:
-        raise PermissionError("channel-readonly")
-
-    message = Message(
-        channel_id=channel.id,
-        user_id=user_id,
-        parent_id=payload.parent_id,
-        text=payload.text,
-        attachments=payload.attachments,
+    channel_id: int,
+    before: int | None,
+    limit: int,
+    parent_id: int | None = None,
+) -> list[Message]:
+    """Return live messages newest-first, keyset-paginated on id.
+
+    Without `parent_id` only top-level messages are listed (served by
+    `ix_messages_channel_live`); with it, the replies of that thread.
+    """
+
+    stmt = select(Message).where(Message.channel_id == channel_id, Message.deleted_at.is_(None))
+    if parent_id is None:
+        stmt = stmt.where(Message.parent_id.is_(None))
+    else:
+        stmt = stmt.where(Message.parent_id == parent_id)
+    if before is not None:
+        stmt = stmt.where(Message.id < before)
+    stmt = stmt.order_by(Message.id.desc()).limit(limit)
+    return list((await db.scalars(stmt)).all())
+
+
+async def list_replies(
+    db: AsyncSession,
+    *,
+    parent_ids: list[int],
+    per_thread: int,
+) -> dict[int, list[Message]]:
+    """Fetch the first `per_thread` live replies of several threads in one query."""
+
+    if not parent_ids:
+        return {}
+    position = (
+        func.row_number()
+        .over(partition_by=Message.parent_id, order_by=Message.id)
+        .label("position")
     )
-    db.add(message)
-    await db.commit()
-    await db.refresh(message)
-    await broker.publish(
-        channel_slug,
-        "message.created",
-        {
-            "id": message.id,
-            "text": message.text,
-            "user_id": message.user_id,
-            "channel_id": message.channel_id,
-        },
+    ranked = (
+        select(Message.id, position)
+        .where(Message.parent_id.in_(parent_ids), Message.deleted_at.is_(None))
+        .subquery()
+    )
+    stmt = (
+        select(Message)
+        .join(ranked, ranked.c.id == Message.id)
+        .where(ranked.c.position <= per_thread)
+        .order_by(Message.parent_id, Message.id)
     )
-    return message
+    replies: dict[int, list[Message]] = {}
+    for message in (await db.scalars(stmt)).all():
+        replies.setdefault(message.parent_id, []).append(message)
+    return replies
 
 
 async def soft_delete_message(
@@ -72,13 +211,14 @@ async def soft_delete_message(
     *,
     message_id: int,
     channel_slug: str,
+    commit: bool = True,
 ) -> None:
     message = await db.get(Message, message_id)
     if not message:
         raise ValueError("message-missing")
     message.deleted_at = datetime.utcnow()
     db.add(message)
-    await db.commit()
+    await (db.commit() if commit else db.flush())
     await broker.publish(
         channel_slug,
         "message.deleted",
@@ -93,13 +233,14 @@ async def set_pin(
     message_id: int,
     channel_slug: str,
     pinned: bool,
+    commit: bool = True,
 ) -> None:
     message = await db.get(Message, message_id)
     if not message:
         raise ValueError("message-missing")
     message.pinned = pinned
     db.add(message)
-    await db.commit()
+    await (db.commit() if commit else db.flush())
     await broker.publish(
         channel_slug,
         "message.pinned",
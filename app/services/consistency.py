@@ -0,0 +1,20 @@
+from app.core.config import get_settings
+from app.services.redis import get_async_redis
+
+_PREFIX = "ryw:"
+
+
+async def pin_reads_to_primary(user_id: int) -> None:
+    """Route the user's reads to the primary for a short window after a write.
+
+    Replicas lag by a few hundred milliseconds; without this a learner could mark
+    a lesson done and immediately read stale progress back.
+    """
+
+    window_ms = int(get_settings().read_your_writes_seconds * 1000)
+    if window_ms > 0:
+        await get_async_redis().set(f"{_PREFIX}{user_id}", 1, px=window_ms)
+
+
+async def reads_pinned_to_primary(user_id: int) -> bool:
+    return bool(await get_async_redis().exists(f"{_PREFIX}{user_id}"))
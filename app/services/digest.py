@@ -0,0 +1,89 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+import logging
+from typing import Dict, List
+
+from sqlalchemy import select
+
+from app.db import session as session_module
+from app.models.course import Course
+from app.models.progress import CourseProgress
+from app.models.user import User
+from app.services.notifications import render_many
+from app.services.redis import get_async_redis
+from app.services.tasks import enqueue_emails
+
+logger = logging.getLogger(__name__)
+
+DIGEST_TEMPLATE = "weekly_digest.html"
+DIGEST_SUBJECT = "Your weekly digest"
+CHECKPOINT_TTL_SECONDS = 8 * 24 * 3600
+
+
+@dataclass
+class DigestRun:
+    week: str
+    users_scanned: int = 0
+    emails_enqueued: int = 0
+    resumed_after: int = 0
+
+
+def current_week(today: date | None = None) -> str:
+    year, week, _ = (today or date.today()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def checkpoint_key(week: str) -> str:
+    return f"digest:weekly:{week}:last_user_id"
+
+
+async def _courses_by_user(user_ids: List[int]) -> Dict[int, List[dict]]:
+    """Every user's course progress for one batch in a single query."""
+
+    stmt = (
+        select(CourseProgress.user_id, Course.title, CourseProgress.percent)
+        .join(Course, Course.id == CourseProgress.course_id)
+        .where(CourseProgress.user_id.in_(user_ids))
+        .order_by(CourseProgress.user_id, CourseProgress.updated_at.desc())
+    )
+    courses: Dict[int, List[dict]] = defaultdict(list)
+    async with session_module.SessionLocal() as session:
+        for user_id, title, percent in await session.execute(stmt):
+            courses[user_id].append({"title": title, "progress": percent})
+    return courses
+
+
+async def run_weekly_digest(*, week: str | None = None, batch_size: int = 1000) -> DigestRun:
+    """Render and enqueue the weekly digest for every user with course activity.
+
+    Users are walked in `id` order with keyset batches, so memory is bounded by
+    `batch_size` regardless of the user count. After each batch is enqueued the
+    last user id is checkpointed in Redis; rerunning the same week resumes after
+    it (a crash between enqueue and checkpoint resends at most that one batch).
+    """
+
+    run = DigestRun(week=week or current_week())
+    redis = get_async_redis()
+    key = checkpoint_key(run.week)
+    last_id = run.resumed_after = int(await redis.get(key) or 0)
+    while True:
+        async with session_module.SessionLocal() as session:
+            users = (
+                await session.execute(
+                    select(User.id, User.email).where(User.id > last_id).order_by(User.id).limit(batch_size)
+                )
+            ).all()
+        if not users:
+            break
+        courses = await _courses_by_user([user.id for user in users])
+        recipients = [user for user in users if courses.get(user.id)]
+        bodies = render_many(DIGEST_TEMPLATE, ({"courses": courses[user.id]} for user in recipients))
+        run.emails_enqueued += await enqueue_emails(
+            (user.email, DIGEST_SUBJECT, body) for user, body in zip(recipients, bodies)
+        )
+        run.users_scanned += len(users)
+        last_id = users[-1].id
+        await redis.set(key, last_id, ex=CHECKPOINT_TTL_SECONDS)
+        logger.info("weekly digest %s: through user %s, %s emails", run.week, last_id, run.emails_enqueued)
+    return run
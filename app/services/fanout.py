@@ -0,0 +1,263 @@
+import asyncio
+from collections import deque
+from contextlib import suppress
+import json
+import logging
+from typing import Any, Deque, Dict, List, Literal, Set
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.services.invalidation import RECONNECT_MAX_SECONDS, RECONNECT_MIN_SECONDS
+from app.services.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "channel:"
+
+
+class SlowConsumer(Exception):
+    """Raised to a socket's reader once its queue overflowed under the disconnect policy."""
+
+
+OverflowPolicy = Literal["drop_oldest", "coalesce", "disconnect"]
+
+
+class ChannelSubscriber:
+    """Bounded delivery queue for one WebSocket.
+
+    The hub only ever calls the non-blocking `offer`, so a slow client can fill
+    its own queue but never stalls the shared Redis reader. When the queue is
+    full the overflow policy decides what happens:
+
+    - `drop_oldest`: discard the oldest queued event;
+    - `coalesce`: replace a queued event for the same `(type, payload.id)`,
+      falling back to dropping the oldest;
+    - `disconnect`: stop delivering and let the reader close the socket.
+
+    Replies to the socket's own frames (acks, errors) go through `reply`: they
+    are delivered ahead of fan-out traffic and no overflow policy evicts them.
+    Their number is bounded by the frames the client itself sends.
+    """
+
+    def __init__(self, slug: str, *, max_queue: int, overflow: OverflowPolicy, user_id: int | None = None):
+        self.slug = slug
+        self.user_id = user_id
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.overflowed = False
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self._queue: Deque[str] = deque()
+        self._replies: Deque[str] = deque()
+        self._ready = asyncio.Event()
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def offer(self, data: str) -> None:
+        if self.overflowed:
+            return
+        if len(self._queue) >= self.max_queue:
+            if self.overflow == "disconnect":
+                self.overflowed = True
+                self._queue.clear()
+                self._ready.set()
+                return
+            if self.overflow == "coalesce" and self._coalesce(data):
+                return
+            self._queue.popleft()
+            self.dropped += 1
+            _dropped.inc()
+        self._queue.append(data)
+        self._ready.set()
+
+    def reply(self, data: str) -> None:
+        self._replies.append(data)
+        self._ready.set()
+
+    def _coalesce(self, data: str) -> bool:
+        key = _coalesce_key(data)
+        if key is None:
+            return False
+        for index in range(len(self._queue) - 1, -1, -1):
+            if _coalesce_key(self._queue[index]) == key:
+                self._queue[index] = data
+                self.coalesced += 1
+                _coalesced.inc()
+                return True
+        return False
+
+    async def get(self) -> str:
+        while not self._queue and not self._replies:
+            if self.overflowed:
+                raise SlowConsumer
+            self._ready.clear()
+            await self._ready.wait()
+        if self.overflowed:
+            raise SlowConsumer
+        if self._replies:
+            return self._replies.popleft()
+        return self._queue.popleft()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "slug": self.slug,
+            "user_id": self.user_id,
+            "depth": self.depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "overflowed": self.overflowed,
+        }
+
+
+def _coalesce_key(data: str) -> tuple[str, Any] | None:
+    try:
+        event = json.loads(data)
+        return event["type"], event["payload"]["id"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+_dropped = metrics.counter("chat_hub.dropped")
+_coalesced = metrics.counter("chat_hub.coalesced")
+
+
+class ChannelHub:
+    """Fan Redis chat events out to every local socket through one subscription.
+
+    Each worker process holds a single pattern subscription on `channel:*` and a
+    registry of local subscribers per slug; a Redis message is decoded once and
+    handed to every socket watching that slug. Redis therefore sees one subscriber
+    connection per process instead of one per socket.
+
+    If the listener fails (e.g. the Redis connection drops) it re-subscribes from
+    within its own task with exponential backoff; local sockets stay registered,
+    and only events published while it was disconnected are missed.
+    """
+
+    def __init__(self, *, max_queue: int, overflow: OverflowPolicy) -> None:
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self._subscribers: Dict[str, Set[ChannelSubscriber]] = {}
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock: asyncio.Lock | None = None
+        self.delivered = metrics.counter("chat_hub.delivered")
+        metrics.gauge("chat_hub.channels", lambda: len(self._subscribers))
+        metrics.gauge("chat_hub.sockets", lambda: sum(len(subs) for subs in self._subscribers.values()))
+        metrics.gauge("chat_hub.slowest_connections", lambda: self.connection_stats(limit=10))
+
+    def refcount(self, slug: str) -> int:
+        return len(self._subscribers.get(slug, ()))
+
+    def connection_stats(self, limit: int | None = None) -> List[Dict[str, Any]]:
+        """Per-connection queue stats, deepest queues first."""
+
+        subscribers = [sub for subs in self._subscribers.values() for sub in subs]
+        subscribers.sort(key=lambda sub: (sub.depth, sub.dropped), reverse=True)
+        return [sub.stats() for sub in subscribers[:limit]]
+
+    async def subscribe(self, slug: str, *, user_id: int | None = None) -> ChannelSubscriber:
+        await self._ensure_listening()
+        subscriber = ChannelSubscriber(slug, max_queue=self.max_queue, overflow=self.overflow, user_id=user_id)
+        self._subscribers.setdefault(slug, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: ChannelSubscriber) -> None:
+        subscribers = self._subscribers.get(subscriber.slug)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers[subscriber.slug]
+
+    async def _ensure_listening(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # a previous event loop (e.g. a finished test client) owned the old listener
+            self._subscribers.clear()
+            self._task = None
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            if self._task is not None and not self._task.done():
+                return
+            self._task = asyncio.create_task(self._run(await self._psubscribe()))
+
+    async def _psubscribe(self):
+        pubsub = get_async_redis().pubsub()
+        try:
+            await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+            # wait for the confirmation so no publish after this point is missed
+            while await pubsub.get_message(timeout=1.0) is None:
+                pass
+        except BaseException:
+            with suppress(Exception):
+                await pubsub.aclose()
+            raise
+        return pubsub
+
+    async def _run(self, pubsub) -> None:
+        while True:
+            try:
+                await self._listen(pubsub)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("chat hub listener crashed; resubscribing")
+            else:
+                logger.warning("chat hub listener stopped; resubscribing")
+            pubsub = await self._resubscribe()
+
+    async def _resubscribe(self):
+        delay = RECONNECT_MIN_SECONDS
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                return await self._psubscribe()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+                logger.exception("chat hub resubscribe failed; retrying in %.1fs", delay)
+
+    async def _listen(self, pubsub) -> None:
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                slug = message["channel"][len(CHANNEL_PREFIX):]
+                subscribers = self._subscribers.get(slug)
+                if not subscribers:
+                    continue
+                data = message["data"]
+                for subscriber in list(subscribers):
+                    subscriber.offer(data)
+                self.delivered.inc(len(subscribers))
+        finally:
+            with suppress(Exception):
+                await pubsub.punsubscribe()
+            with suppress(Exception):
+                await pubsub.aclose()
+
+    async def close(self) -> None:
+        if self._task is not None and self._loop is asyncio.get_running_loop():
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+        self._task = None
+        self._subscribers.clear()
+
+
+_hub: ChannelHub | None = None
+
+
+def get_channel_hub() -> ChannelHub:
+    global _hub
+    if _hub is None:
+        settings = get_settings()
+        _hub = ChannelHub(max_queue=settings.chat_send_queue_size, overflow=settings.chat_overflow_policy)
+    return _hub
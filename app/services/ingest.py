@@ -0,0 +1,193 @@
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+import logging
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.db import session as session_module
+from app.models.chat import Message
+from app.schemas.chat import MessagePayload
+from app.services.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Pending:
+    channel_id: int
+    channel_slug: str
+    user_id: int
+    payload: MessagePayload
+    future: asyncio.Future = field(repr=False)
+
+    def row(self) -> Dict[str, Any]:
+        return {
+            "channel_id": self.channel_id,
+            "user_id": self.user_id,
+            "parent_id": self.payload.parent_id,
+            "text": self.payload.text,
+            "attachments": self.payload.attachments,
+            "created_at": datetime.utcnow(),
+        }
+
+
+class MessageIngestor:
+    """Write-behind stage that turns bursts of chat lines into grouped INSERTs.
+
+    `submit` queues a message and resolves once the batch holding it is
+    committed. A single flusher drains the queue every `flush_interval` seconds
+    or `max_batch` messages, inserts the whole batch with one multi-row
+    `INSERT ... RETURNING` (ids come back in submission order), commits, and then
+    publishes the `message.created` events in one pipelined Redis round trip.
+    """
+
+    def __init__(self, *, max_batch: int, flush_interval: float):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue: "asyncio.Queue[_Pending | None] | None" = None
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.batch_sizes = metrics.histogram("chat_ingest.batch_size", (1, 5, 10, 25, 50, 100, 250, 500))
+        self.flush_ms = metrics.histogram("chat_ingest.flush_ms")
+        self.failures = metrics.counter("chat_ingest.failures")
+
+    def _ensure_running(self) -> "asyncio.Queue[_Pending | None]":
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run(self._queue))
+        return self._queue
+
+    async def submit(
+        self,
+        *,
+        channel_id: int,
+        channel_slug: str,
+        user_id: int,
+        payload: MessagePayload,
+    ) -> Dict[str, Any]:
+        """Queue a message and wait until it is durably stored; returns the created event payload."""
+
+        queue = self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait(_Pending(channel_id, channel_slug, user_id, payload, future))
+        return await future
+
+    async def _run(self, queue: "asyncio.Queue[_Pending | None]") -> None:
+        while True:
+            first = await queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stopping = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                await self._flush(batch)
+            except Exception as exc:
+                logger.exception("chat ingest flush failed")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(exc)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[_Pending]) -> None:
+        started = time.perf_counter()
+        try:
+            events = await self._insert(batch)
+        except SQLAlchemyError:
+            # one bad row (e.g. an unknown parent_id) must not fail its neighbours
+            self.failures.inc()
+            events = []
+            for pending in batch:
+                try:
+                    events.extend(await self._insert([pending]))
+                except SQLAlchemyError as exc:
+                    if not pending.future.done():
+                        pending.future.set_exception(exc)
+        self.batch_sizes.observe(len(batch))
+        self.flush_ms.observe((time.perf_counter() - started) * 1000)
+        if not events:
+            return
+
+        pipe = get_async_redis().pipeline(transaction=False)
+        for pending, event in events:
+            pipe.publish(
+                f"channel:{pending.channel_slug}",
+                json.dumps({"type": "message.created", "payload": event}),
+            )
+        try:
+            await pipe.execute()
+        except Exception:  # the rows are committed either way; the ack must still go out
+            logger.exception("failed to publish %d chat events", len(events))
+        for pending, event in events:
+            if not pending.future.done():
+                pending.future.set_result(event)
+
+    async def _insert(self, batch: List[_Pending]) -> List[tuple[_Pending, Dict[str, Any]]]:
+        stmt = insert(Message).returning(
+            Message.id,
+            Message.created_at,
+            sort_by_parameter_order=True,
+        )
+        async with session_module.SessionLocal() as session:
+            result = await session.execute(stmt, [pending.row() for pending in batch])
+            rows = result.all()
+            await session.commit()
+        return [
+            (
+                pending,
+                {
+                    "id": row.id,
+                    "text": pending.payload.text,
+                    "user_id": pending.user_id,
+                    "channel_id": pending.channel_id,
+                    "parent_id": pending.payload.parent_id,
+                    "created_at": row.created_at.isoformat(),
+                },
+            )
+            for pending, row in zip(batch, rows)
+        ]
+
+    async def close(self) -> None:
+        """Flush whatever is queued and stop the flusher."""
+
+        task, self._task = self._task, None
+        if task is None or task.done() or self._loop is not asyncio.get_running_loop():
+            return
+        self._queue.put_nowait(None)
+        await task
+
+
+_ingestor: MessageIngestor | None = None
+
+
+def get_message_ingestor() -> MessageIngestor:
+    global _ingestor
+    if _ingestor is None:
+        settings = get_settings()
+        _ingestor = MessageIngestor(
+            max_batch=settings.chat_ingest_max_batch,
+            flush_interval=settings.chat_ingest_flush_ms / 1000,
+        )
+    return _ingestor
@@ -0,0 +1,103 @@
+import asyncio
+from contextlib import suppress
+import json
+import logging
+from typing import Callable, Dict, List
+
+from app.services.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "app:invalidate"
+RECONNECT_MIN_SECONDS = 0.5
+RECONNECT_MAX_SECONDS = 30.0
+
+Handler = Callable[[str], None]
+
+
+class InvalidationBus:
+    """Broadcast cache invalidations to every worker process over Redis pub/sub.
+
+    Handlers are registered per topic and receive the invalidated key. Publishing
+    also runs the local handlers immediately, so the current process never waits
+    for its own message to round-trip through Redis.
+    """
+
+    def __init__(self) -> None:
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._task: asyncio.Task | None = None
+        self._ready = asyncio.Event()
+        self._subscribed = False
+
+    def register(self, topic: str, handler: Handler) -> None:
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def _dispatch(self, topic: str, key: str) -> None:
+        for handler in self._handlers.get(topic, []):
+            handler(key)
+
+    async def publish(self, topic: str, key: str | int) -> None:
+        self._dispatch(topic, str(key))
+        redis = get_async_redis()
+        await redis.publish(INVALIDATION_CHANNEL, json.dumps({"topic": topic, "key": str(key)}))
+
+    async def start(self) -> None:
+        """Start listening; returns once the first subscribe attempt succeeded or failed.
+
+        A failure (e.g. Redis down at boot) is logged and retried in the background
+        rather than blocking startup.
+        """
+
+        if self._task is not None and not self._task.done():
+            return
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        delay = RECONNECT_MIN_SECONDS
+        while True:
+            self._subscribed = False
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("invalidation listener failed; reconnecting in %.1fs", delay)
+            else:
+                logger.warning("invalidation listener stopped; reconnecting in %.1fs", delay)
+            self._ready.set()
+            if self._subscribed:
+                delay = RECONNECT_MIN_SECONDS
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+    async def _listen(self) -> None:
+        pubsub = get_async_redis().pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            self._subscribed = True
+            self._ready.set()
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                try:
+                    data = json.loads(message["data"])
+                    self._dispatch(data["topic"], data["key"])
+                except (ValueError, KeyError):
+                    logger.warning("invalid invalidation message: %r", message["data"])
+        finally:
+            with suppress(Exception):
+                await pubsub.unsubscribe(INVALIDATION_CHANNEL)
+            with suppress(Exception):
+                await pubsub.aclose()
+
+invalidation_bus = InvalidationBus()
@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.invite import Invite
 from app.models.user import User, UserRole
 from app.services.audit import log_event
+from app.services.principals import invalidate_principal
 
 
 def _ensure_aware(dt: datetime) -> datetime:
@@ -64,4 +65,5 @@ async def redeem_invite(db: AsyncSession, *, code: str, user: User) -> UserRole:
         meta={"role": user.role.value},
     )
     await db.commit()
+    await invalidate_principal(user.id)
     return user.role
@@ -1,21 +1,56 @@
-import smtplib
+import os
 from email.mime.text import MIMEText
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Iterator
 
-from jinja2 import Environment, PackageLoader, select_autoescape
+from jinja2 import Environment, FileSystemBytecodeCache, PackageLoader, select_autoescape
 
 from app.core.config import get_settings
+from app.services.smtp_pool import get_smtp_pool
 
-env = Environment(
-    loader=PackageLoader("app", "templates"),
-    autoescape=select_autoescape(["html", "txt"]),
-)
+
+def _create_env() -> Environment:
+    settings = get_settings()
+    # without a configured directory Jinja uses a private per-user temp dir, checking owner and mode;
+    # a configured one must only be writable by the app's user, as its bytecode is executed
+    if settings.template_cache_dir:
+        os.makedirs(settings.template_cache_dir, mode=0o700, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(settings.template_cache_dir)
+    else:
+        bytecode_cache = FileSystemBytecodeCache()
+    return Environment(
+        loader=PackageLoader("app", "templates"),
+        autoescape=select_autoescape(["html", "txt"]),
+        # compiled templates survive restarts and are shared by every worker process
+        bytecode_cache=bytecode_cache,
+        # without this every lookup stats the template file to check for edits
+        auto_reload=settings.template_auto_reload,
+    )
+
+
+env = _create_env()
+
+
+def warm_templates() -> int:
+    """Compile every template up front (filling the bytecode cache); returns how many."""
+
+    names = env.list_templates()
+    for name in names:
+        env.get_template(name)
+    return len(names)
 
 
 def render_template(template_name: str, context: Dict[str, Any]) -> str:
     return env.get_template(template_name).render(**context)
 
 
+def render_many(template_name: str, contexts: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Render one template for many recipients, lazily, looking it up only once."""
+
+    render = env.get_template(template_name).render
+    for context in contexts:
+        yield render(context)
+
+
 def send_email(to_email: str, subject: str, body: str) -> None:
     settings = get_settings()
     msg = MIMEText(body, "html")
@@ -23,7 +58,4 @@ def send_email(to_email: str, subject: str, body: str) -> None:
     msg["From"] = settings.smtp_user or "noreply@example.com"
     msg["To"] = to_email
 
-    with smtplib.SMTP(settings.smtp_host, settings.smtp_port) as smtp:
-        if settings.smtp_user and settings.smtp_pass:
-            smtp.login(settings.smtp_user, settings.smtp_pass)
-        smtp.sendmail(msg["From"], [to_email], msg.as_string())
+    get_smtp_pool().send(msg["From"], [to_email], msg.as_string())
@@ -0,0 +1,92 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from app.core.config import get_settings
+from app.core.security import get_password_hash, password_needs_rehash, verify_password
+
+T = TypeVar("T")
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the hashing queue is full and the request should be shed."""
+
+
+class PasswordHasher:
+    """Run bcrypt on a dedicated thread pool so the event loop never blocks on it.
+
+    bcrypt releases the GIL while hashing, so a thread pool gives real parallelism.
+    `max_workers=0` disables offloading and hashes inline on the event loop.
+    """
+
+    def __init__(self, *, max_workers: int, max_pending: int, rounds: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._pending = 0
+        self._executor: ThreadPoolExecutor | None = None
+        if max_workers > 0:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        if self._pending >= self.max_pending:
+            raise PasswordHasherBusy("password-hasher-busy")
+        self._pending += 1
+        try:
+            if self._executor is None:
+                return func(*args)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password, self.rounds)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(verify_password, password, password_hash)
+
+    async def verify_and_update(self, password: str, password_hash: str) -> tuple[bool, str | None]:
+        """Verify a password and, if the cost factor changed, return a fresh hash.
+
+        Both steps run in a single pool job so a rehash costs no extra queue slot.
+        """
+
+        return await self._run(self._verify_and_update, password, password_hash)
+
+    def _verify_and_update(self, password: str, password_hash: str) -> tuple[bool, str | None]:
+        if not verify_password(password, password_hash):
+            return False, None
+        if password_needs_rehash(password_hash, self.rounds):
+            return True, get_password_hash(password, self.rounds)
+        return True, None
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_hasher: PasswordHasher | None = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    global _hasher
+    if _hasher is None:
+        settings = get_settings()
+        _hasher = PasswordHasher(
+            max_workers=settings.password_hash_workers,
+            max_pending=settings.password_hash_max_pending,
+            rounds=settings.bcrypt_rounds,
+        )
+    return _hasher
+
+
+def shutdown_password_hasher() -> None:
+    global _hasher
+    if _hasher is not None:
+        _hasher.shutdown()
+        _hasher = None
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+import time
+from typing import Any, Dict, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.models.user import User
+from app.services.invalidation import invalidation_bus
+
+PRINCIPAL_TOPIC = "principal"
+
+PrincipalKey = Tuple[int, int]
+
+
+class PrincipalCache:
+    """Size-bounded LRU of user rows keyed by (user id, token iat), with a TTL.
+
+    Only column values are stored; `load_principal` re-attaches them to the request session
+    as a persistent `User` without emitting any SQL, so downstream code that
+    mutates the user (e.g. invite redemption) keeps working unchanged.
+    """
+
+    def __init__(self, *, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[PrincipalKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._by_user: Dict[int, Set[int]] = {}
+        self.hits = metrics.counter("principal_cache.hits")
+        self.misses = metrics.counter("principal_cache.misses")
+        self.evictions = metrics.counter("principal_cache.evictions")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: PrincipalKey) -> Dict[str, Any] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses.inc()
+            return None
+        expires_at, fields = entry
+        if expires_at <= time.monotonic():
+            self._discard(key)
+            self.misses.inc()
+            return None
+        self._entries.move_to_end(key)
+        self.hits.inc()
+        return fields
+
+    def put(self, key: PrincipalKey, user: User) -> None:
+        if self.max_size <= 0:
+            return
+        fields = {attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs}
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, fields)
+        self._entries.move_to_end(key)
+        self._by_user.setdefault(key[0], set()).add(key[1])
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions.inc()
+
+    def invalidate_user(self, user_id: int) -> None:
+        for iat in self._by_user.pop(user_id, set()):
+            self._entries.pop((user_id, iat), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_user.clear()
+
+    def _discard(self, key: PrincipalKey) -> None:
+        self._entries.pop(key, None)
+        iats = self._by_user.get(key[0])
+        if iats is not None:
+            iats.discard(key[1])
+            if not iats:
+                del self._by_user[key[0]]
+
+
+_cache: PrincipalCache | None = None
+
+
+def get_principal_cache() -> PrincipalCache:
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = PrincipalCache(
+            max_size=settings.principal_cache_max_size,
+            ttl_seconds=settings.principal_cache_ttl_seconds,
+        )
+        metrics.gauge("principal_cache.size", lambda: len(get_principal_cache()))
+    return _cache
+
+
+def _on_invalidate(key: str) -> None:
+    get_principal_cache().invalidate_user(int(key))
+
+
+invalidation_bus.register(PRINCIPAL_TOPIC, _on_invalidate)
+
+
+async def load_principal(db: AsyncSession, payload: Dict[str, Any], *, cache_result: bool = True) -> User | None:
+    """Return the token's user, served from the cache when possible.
+
+    Pass `cache_result=False` when `db` may be stale (a replica): a lagging row
+    must not outlive the invalidation that already fired for it.
+    """
+
+    user_id = int(payload["sub"])
+    key = (user_id, int(payload.get("iat", 0)))
+    cache = get_principal_cache()
+    fields = cache.get(key)
+    if fields is not None:
+        user = User(**fields)
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+    user = await db.get(User, user_id)
+    if user is not None and cache_result:
+        cache.put(key, user)
+    return user
+
+
+async def invalidate_principal(user_id: int) -> None:
+    """Drop cached principals for a user in every worker; call after changing a user."""
+
+    await invalidation_bus.publish(PRINCIPAL_TOPIC, user_id)
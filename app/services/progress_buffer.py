@@ -0,0 +1,281 @@
+import asyncio
+from contextlib import suppress
+import logging
+import time
+from typing import Any, Dict, Iterable, List
+
+from redis.commands.core import AsyncScript
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.crud import progress as progress_crud
+from app.db import session as session_module
+from app.services.consistency import pin_reads_to_primary
+from app.services.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+BUFFER_PREFIX = "progress:buf:"
+DIRTY_KEY = "progress:dirty"
+FLUSHING_KEY = "progress:flushing"
+
+# KEYS: buffer hash, dirty set; ARGV: user id, then (lesson id, status, percent) triples
+_RECORD = """
+for i = 2, #ARGV, 3 do
+    local status = ARGV[i + 1]
+    local percent = tonumber(ARGV[i + 2])
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    if current then
+        local sep = string.find(current, ':', 1, true)
+        local current_percent = tonumber(string.sub(current, sep + 1))
+        if current_percent > percent then
+            percent = current_percent
+        end
+        if string.sub(current, 1, sep - 1) == 'done' then
+            status = 'done'
+        end
+    end
+    if status == 'done' then
+        percent = 100
+    end
+    redis.call('HSET', KEYS[1], ARGV[i], status .. ':' .. percent)
+end
+redis.call('SADD', KEYS[2], ARGV[1])
+return 1
+"""
+
+# KEYS: buffer hash, dirty set; ARGV: user id, then (lesson id, flushed value) pairs
+_RELEASE = """
+for i = 2, #ARGV, 2 do
+    if redis.call('HGET', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+if redis.call('HLEN', KEYS[1]) > 0 then
+    redis.call('SADD', KEYS[2], ARGV[1])
+end
+return 1
+"""
+
+# KEYS: dirty set, flushing zset; ARGV: max users. Claims users and stamps them with the server time.
+_CLAIM = """
+local ids = redis.call('SPOP', KEYS[1], tonumber(ARGV[1]))
+if #ids > 0 then
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+    for _, id in ipairs(ids) do
+        redis.call('ZADD', KEYS[2], now, id)
+    end
+end
+return ids
+"""
+
+# KEYS: dirty set, flushing zset; ARGV: claim timeout in ms. Hands back claims whose flusher died.
+_RECOVER = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[1]))
+for _, id in ipairs(ids) do
+    redis.call('SADD', KEYS[1], id)
+    redis.call('ZREM', KEYS[2], id)
+end
+return #ids
+"""
+
+_scripts: Dict[str, AsyncScript] = {}
+
+
+def _decode(value: str) -> tuple[str, int]:
+    status, _, percent = value.partition(":")
+    return status, int(percent)
+
+
+class ProgressBuffer:
+    """Coalesce progress heartbeats in Redis and write them to the database in bulk.
+
+    Each user has a hash `progress:buf:<user_id>` of `lesson_id -> status:percent`,
+    merged monotonically by a Lua script, and is listed in the `progress:dirty`
+    set. Every `flush_interval` seconds the flusher moves dirty users into the
+    `progress:flushing` zset (scored by claim time), upserts all their lessons in
+    one statement, deletes only the fields that were not updated again meanwhile
+    (compare-and-delete) and only then drops the claim, so no heartbeat is lost.
+    Claims older than `claim_timeout` belong to a flusher that died mid-flush and
+    are put back in `progress:dirty`; rewriting them is harmless as upserts are
+    monotonic.
+    """
+
+    def __init__(self, *, flush_interval: float, max_users: int, claim_timeout: float):
+        self.flush_interval = flush_interval
+        self.max_users = max_users
+        self.claim_timeout = claim_timeout
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.recorded = metrics.counter("progress_buffer.recorded")
+        self.flushed_rows = metrics.counter("progress_buffer.flushed_rows")
+        self.dropped_rows = metrics.counter("progress_buffer.dropped_rows")
+        self.recovered_users = metrics.counter("progress_buffer.recovered_users")
+        self.flush_ms = metrics.histogram("progress_buffer.flush_ms")
+
+    def _script(self, name: str, source: str) -> AsyncScript:
+        script = _scripts.get(name)
+        if script is None:
+            script = get_async_redis().register_script(source)
+            _scripts[name] = script
+        return script
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._task = asyncio.create_task(self._run())
+
+    async def record(self, user_id: int, items: Iterable[tuple[int, str, int]]) -> int:
+        """Buffer a user's `(lesson_id, status, percent)` updates; returns the lessons touched."""
+
+        merged = progress_crud.merge_progress(items)
+        if not merged:
+            return 0
+        self._ensure_running()
+        args: List[Any] = [user_id]
+        for lesson_id, (status, percent) in merged.items():
+            args.extend((lesson_id, status, percent))
+        redis = get_async_redis()
+        await self._script("record", _RECORD)(keys=[f"{BUFFER_PREFIX}{user_id}", DIRTY_KEY], args=args, client=redis)
+        self.recorded.inc(len(merged))
+        return len(merged)
+
+    async def pending(self, user_id: int) -> Dict[int, tuple[str, int]]:
+        """Buffered, not yet flushed `lesson_id -> (status, percent)` for a user."""
+
+        values = await get_async_redis().hgetall(f"{BUFFER_PREFIX}{user_id}")
+        return {int(lesson_id): _decode(value) for lesson_id, value in values.items()}
+
+    async def overlay(self, user_id: int, lessons: List[Dict[str, Any]]) -> None:
+        """Merge buffered progress into lesson dicts from `courses_crud.get_course_detail`."""
+
+        pending = await self.pending(user_id)
+        if not pending:
+            return
+        for lesson in lessons:
+            buffered = pending.get(lesson["id"])
+            if buffered is None:
+                continue
+            updates = [(lesson["id"], *buffered)]
+            if lesson["status"] is not None:
+                updates.append((lesson["id"], lesson["status"], lesson["percent"]))
+            lesson["status"], lesson["percent"] = progress_crud.merge_progress(updates)[lesson["id"]]
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("progress buffer flush failed")
+
+    async def flush(self) -> int:
+        """Write every dirty user's buffered progress; returns the rows written."""
+
+        redis = get_async_redis()
+        await self.recover()
+        claim = self._script("claim", _CLAIM)
+        written = 0
+        while True:
+            claimed = await claim(keys=[DIRTY_KEY, FLUSHING_KEY], args=[self.max_users], client=redis)
+            user_ids = [int(user_id) for user_id in claimed]
+            if not user_ids:
+                return written
+            started = time.perf_counter()
+            pipe = redis.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.hgetall(f"{BUFFER_PREFIX}{user_id}")
+            snapshots = dict(zip(user_ids, await pipe.execute()))
+            try:
+                written += await self._write(snapshots)
+            except Exception:
+                # nothing was released; put the users back so the next tick retries
+                requeue = redis.pipeline(transaction=True)
+                requeue.sadd(DIRTY_KEY, *user_ids)
+                requeue.zrem(FLUSHING_KEY, *user_ids)
+                await requeue.execute()
+                raise
+            await self._release(snapshots)
+            await redis.zrem(FLUSHING_KEY, *user_ids)
+            with suppress(Exception):
+                for user_id in user_ids:
+                    await pin_reads_to_primary(user_id)
+            self.flush_ms.observe((time.perf_counter() - started) * 1000)
+            if len(user_ids) < self.max_users:
+                return written
+
+    async def recover(self) -> int:
+        """Return users claimed by a flusher that died mid-flush to `progress:dirty`."""
+
+        recovered = await self._script("recover", _RECOVER)(
+            keys=[DIRTY_KEY, FLUSHING_KEY],
+            args=[int(self.claim_timeout * 1000)],
+            client=get_async_redis(),
+        )
+        if recovered:
+            self.recovered_users.inc(recovered)
+            logger.warning("recovered %s users from an interrupted progress flush", recovered)
+        return recovered
+
+    async def _write(self, snapshots: Dict[int, Dict[str, str]]) -> int:
+        rows = []
+        for user_id, values in snapshots.items():
+            for lesson_id, value in values.items():
+                status, percent = _decode(value)
+                rows.append({"user_id": user_id, "lesson_id": int(lesson_id), "status": status, "percent": percent})
+        async with session_module.SessionLocal() as session:
+            try:
+                await progress_crud.upsert_progress_rows(session, rows)
+            except ValueError:
+                # an unknown lesson fails the statement; retry per row and drop the bad ones
+                for row in rows:
+                    try:
+                        await progress_crud.upsert_progress_rows(session, [row])
+                    except ValueError:
+                        self.dropped_rows.inc()
+                        logger.warning("dropping buffered progress for unknown lesson %s", row["lesson_id"])
+        self.flushed_rows.inc(len(rows))
+        return len(rows)
+
+    async def _release(self, snapshots: Dict[int, Dict[str, str]]) -> None:
+        redis = get_async_redis()
+        script = self._script("release", _RELEASE)
+        for user_id, values in snapshots.items():
+            if not values:
+                continue
+            args: List[Any] = [user_id]
+            for lesson_id, value in values.items():
+                args.extend((lesson_id, value))
+            await script(keys=[f"{BUFFER_PREFIX}{user_id}", DIRTY_KEY], args=args, client=redis)
+
+    async def close(self) -> None:
+        """Stop the flusher and write whatever is still buffered."""
+
+        task, self._task = self._task, None
+        if task is None or self._loop is not asyncio.get_running_loop():
+            return
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        await self.flush()
+
+
+_buffer: ProgressBuffer | None = None
+
+
+def get_progress_buffer() -> ProgressBuffer:
+    global _buffer
+    if _buffer is None:
+        settings = get_settings()
+        _buffer = ProgressBuffer(
+            flush_interval=settings.progress_flush_interval_seconds,
+            max_users=settings.progress_flush_max_users,
+            claim_timeout=settings.progress_flush_claim_timeout_seconds,
+        )
+    return _buffer
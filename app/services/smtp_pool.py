@@ -0,0 +1,217 @@
+import atexit
+from collections import deque
+from dataclasses import dataclass, field
+import smtplib
+import threading
+import time
+from typing import Deque, Sequence
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+
+def _connection_broken(exc: BaseException) -> bool:
+    """True if the connection is unusable; refused recipients etc. leave it intact."""
+
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    # SMTPException subclasses OSError, so only plain socket errors count here
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+class SMTPPoolExhausted(RuntimeError):
+    """No connection became free within the pool timeout."""
+
+
+@dataclass
+class _Connection:
+    smtp: smtplib.SMTP
+    sent: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class SMTPConnectionPool:
+    """Thread-safe pool of logged-in SMTP connections for the email worker.
+
+    Connections are reused LIFO so the hottest ones stay warm. A connection idle
+    for longer than `noop_after` seconds is probed with NOOP before use, one that
+    has sent `max_messages` messages is retired (relays often cap this), and a
+    send that fails because the connection died is retried once on a fresh one.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        *,
+        user: str | None = None,
+        password: str | None = None,
+        starttls: bool = False,
+        max_size: int = 4,
+        max_messages: int = 100,
+        noop_after: float = 30.0,
+        timeout: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.max_size = max_size
+        self.max_messages = max_messages
+        self.noop_after = noop_after
+        self.timeout = timeout
+        self._idle: Deque[_Connection] = deque()
+        self._open = 0
+        self._closed = False
+        self._available = threading.Condition()
+        self.connects = metrics.counter("smtp_pool.connects")
+        self.reconnects = metrics.counter("smtp_pool.reconnects")
+        self.sent = metrics.counter("smtp_pool.sent")
+
+    def send(self, from_addr: str, to_addrs: Sequence[str], message: str) -> None:
+        conn = self._acquire()
+        try:
+            conn.smtp.sendmail(from_addr, list(to_addrs), message)
+        except Exception as exc:
+            if not _connection_broken(exc):
+                self._release(conn)
+                raise
+            # the relay dropped us (idle timeout, restart); one retry on a new connection
+            self._discard(conn)
+            self.reconnects.inc()
+            conn = self._connect()
+            try:
+                conn.smtp.sendmail(from_addr, list(to_addrs), message)
+            except Exception as retry_exc:
+                if _connection_broken(retry_exc):
+                    self._discard(conn)
+                else:
+                    self._release(conn)
+                raise
+        conn.sent += 1
+        self.sent.inc()
+        self._release(conn)
+
+    def _acquire(self) -> _Connection:
+        deadline = time.monotonic() + self.timeout
+        with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError("SMTP pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise SMTPPoolExhausted(f"no SMTP connection free after {self.timeout}s")
+                self._available.wait(remaining)
+        if conn is None:
+            try:
+                return self._open_connection()
+            except BaseException:
+                self._forget()
+                raise
+        if time.monotonic() - conn.last_used >= self.noop_after and not self._alive(conn):
+            self._discard(conn)
+            self.reconnects.inc()
+            return self._connect()
+        return conn
+
+    def _connect(self) -> _Connection:
+        """Open a connection in the slot of one that was just discarded."""
+
+        with self._available:
+            self._open += 1
+        try:
+            return self._open_connection()
+        except BaseException:
+            self._forget()
+            raise
+
+    def _open_connection(self) -> _Connection:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.user and self.password:
+                smtp.login(self.user, self.password)
+        except BaseException:
+            smtp.close()
+            raise
+        self.connects.inc()
+        return _Connection(smtp)
+
+    @staticmethod
+    def _alive(conn: _Connection) -> bool:
+        try:
+            return conn.smtp.noop()[0] == 250
+        except OSError:
+            return False
+
+    def _release(self, conn: _Connection) -> None:
+        if self._closed or conn.sent >= self.max_messages:
+            self._discard(conn, quit=True)
+            return
+        conn.last_used = time.monotonic()
+        with self._available:
+            self._idle.append(conn)
+            self._available.notify()
+
+    def _discard(self, conn: _Connection, *, quit: bool = False) -> None:
+        try:
+            if quit:
+                conn.smtp.quit()
+            else:
+                conn.smtp.close()
+        except OSError:
+            conn.smtp.close()
+        self._forget()
+
+    def _forget(self) -> None:
+        with self._available:
+            self._open -= 1
+            self._available.notify()
+
+    def close(self) -> None:
+        with self._available:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            self._discard(conn, quit=True)
+
+
+_pool: SMTPConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                settings = get_settings()
+                _pool = SMTPConnectionPool(
+                    settings.smtp_host,
+                    settings.smtp_port,
+                    user=settings.smtp_user,
+                    password=settings.smtp_pass,
+                    starttls=settings.smtp_starttls,
+                    max_size=settings.smtp_pool_size,
+                    max_messages=settings.smtp_max_messages_per_connection,
+                    noop_after=settings.smtp_noop_after_seconds,
+                    timeout=settings.smtp_timeout_seconds,
+                )
+                atexit.register(close_smtp_pool)
+    return _pool
+
+
+def close_smtp_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
@@ -1,8 +1,12 @@
-from datetime import timedelta
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import time
+from typing import Dict, Iterable
 
 from minio import Minio
 
 from app.core.config import get_settings
+from app.core.metrics import metrics
 
 _client: Minio | None = None
 
@@ -16,16 +20,80 @@ def get_client() -> Minio:
             access_key=settings.s3_access_key,
             secret_key=settings.s3_secret_key,
             secure=settings.s3_endpoint.startswith("https"),
+            # with the region known up front, presigning never does a bucket-location lookup
+            region=settings.s3_region,
         )
     return _client
 
 
+class PresignedUrlCache:
+    """Per-process LRU of presigned URLs, keyed by object key, expiry and time bucket.
+
+    Signatures are made with `request_date` rounded down to a `bucket_seconds`
+    boundary and valid for `expires + bucket_seconds`, so everyone asking for the
+    same key within one bucket gets the same URL, and every URL handed out still
+    has at least `expires` left.
+    """
+
+    def __init__(self, *, max_size: int, bucket_seconds: int):
+        self.max_size = max_size
+        self.bucket_seconds = bucket_seconds
+        self._urls: "OrderedDict[tuple[str, int, int], str]" = OrderedDict()
+        self.hits = metrics.counter("presign_cache.hits")
+        self.misses = metrics.counter("presign_cache.misses")
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def get(self, key: str, expires: timedelta) -> str:
+        bucket = int(time.time()) // self.bucket_seconds
+        cache_key = (key, int(expires.total_seconds()), bucket)
+        url = self._urls.get(cache_key)
+        if url is not None:
+            self._urls.move_to_end(cache_key)
+            self.hits.inc()
+            return url
+        self.misses.inc()
+        url = get_client().get_presigned_url(
+            "GET",
+            bucket_name=get_settings().s3_bucket,
+            object_name=key,
+            expires=expires + timedelta(seconds=self.bucket_seconds),
+            request_date=datetime.fromtimestamp(bucket * self.bucket_seconds, timezone.utc),
+        )
+        if self.max_size > 0:
+            self._urls[cache_key] = url
+            while len(self._urls) > self.max_size:
+                self._urls.popitem(last=False)
+        return url
+
+    def clear(self) -> None:
+        self._urls.clear()
+
+
+_cache: PresignedUrlCache | None = None
+
+
+def get_presigned_url_cache() -> PresignedUrlCache:
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = PresignedUrlCache(
+            max_size=settings.s3_presign_cache_size,
+            bucket_seconds=settings.s3_presign_bucket_seconds,
+        )
+        metrics.gauge("presign_cache.size", lambda: len(get_presigned_url_cache()))
+    return _cache
+
+
 def generate_presigned_url(key: str, expires: timedelta = timedelta(minutes=5)) -> str:
-    client = get_client()
-    settings = get_settings()
-    return client.get_presigned_url(
-        "GET",
-        bucket_name=settings.s3_bucket,
-        object_name=key,
-        expires=expires,
-    )
+    """Sign a GET for `key`; pure CPU work (no network), cheap enough to call inline."""
+
+    return get_presigned_url_cache().get(key, expires)
+
+
+def generate_presigned_urls(keys: Iterable[str], expires: timedelta = timedelta(minutes=5)) -> Dict[str, str]:
+    """Sign every distinct key in one pass; returns `key -> url`."""
+
+    cache = get_presigned_url_cache()
+    return {key: cache.get(key, expires) for key in dict.fromkeys(keys)}
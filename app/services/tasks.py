@@ -1,8 +1,18 @@
+import json
+import time
+from typing import Any, Dict, Iterable, Tuple
+
 from fastapi.concurrency import run_in_threadpool
 from rq import Queue
 
+from app.core.config import get_settings
 from app.services.notifications import send_email
-from app.services.redis import get_redis
+from app.services.redis import get_async_redis, get_redis
+
+EMAIL_QUEUE_KEY = "jobs:email"
+_ENQUEUE_CHUNK = 1000
+
+EmailJob = Tuple[str, str, str]
 
 _queue: Queue | None = None
 
@@ -15,6 +25,38 @@ def get_queue() -> Queue:
     return _queue
 
 
+def encode_email_job(to_email: str, subject: str, body: str) -> str:
+    """Compact JSON job consumed by `app.workers.email` (no pickled callables)."""
+
+    return json.dumps({"v": 1, "to": to_email, "subject": subject, "body": body, "ts": time.time()}, separators=(",", ":"))
+
+
+def decode_email_job(raw: str) -> Dict[str, Any]:
+    job = json.loads(raw)
+    if job.get("v") != 1:
+        raise ValueError(f"unsupported email job version: {job.get('v')!r}")
+    return job
+
+
 async def enqueue_email(to_email: str, subject: str, body: str) -> None:
-    queue = get_queue()
-    await run_in_threadpool(queue.enqueue, send_email, to_email, subject, body)
+    await enqueue_emails([(to_email, subject, body)])
+
+
+async def enqueue_emails(jobs: Iterable[EmailJob]) -> int:
+    """Queue many emails; with the `redis_list` backend this is one pipelined round trip."""
+
+    jobs = list(jobs)
+    if not jobs:
+        return 0
+    if get_settings().email_queue_backend == "rq":
+        queue = get_queue()
+        await run_in_threadpool(
+            queue.enqueue_many,
+            [Queue.prepare_data(send_email, args=job) for job in jobs],
+        )
+        return len(jobs)
+    pipe = get_async_redis().pipeline(transaction=False)
+    for start in range(0, len(jobs), _ENQUEUE_CHUNK):
+        pipe.lpush(EMAIL_QUEUE_KEY, *(encode_email_job(*job) for job in jobs[start : start + _ENQUEUE_CHUNK]))
+    await pipe.execute()
+    return len(jobs)
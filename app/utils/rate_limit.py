@@ -1,25 +1,242 @@
+from collections import OrderedDict
 from dataclasses import dataclass
+import time
+from typing import Literal
 
 from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+
+from app.core.metrics import metrics
+
+Algorithm = Literal["token_bucket", "sliding_log"]
+
+# Both scripts take KEYS[1] = bucket key and ARGV = limit, window_ms, cost, lease, and
+# return {allowed, remaining, retry_after_ms, reset_ms, leased}. `lease` asks for up to
+# that many extra tokens on top of an allowed hit so a local tier can spend them without
+# another round trip. Time comes from the Redis server so every worker agrees on the clock.
+_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local lease = tonumber(ARGV[4]) or 0
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rate = capacity / window_ms
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+  tokens = capacity
+  ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local retry_after = 0
+local leased = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  leased = math.min(lease, math.floor(tokens))
+  tokens = tokens - leased
+  allowed = 1
+else
+  retry_after = math.ceil((math.min(cost, capacity) - tokens) / rate)
+end
+
+local reset = math.ceil((capacity - tokens) / rate)
+if reset > 0 then
+  redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+  redis.call('PEXPIRE', KEYS[1], reset)
+else
+  redis.call('DEL', KEYS[1])
+end
+return {allowed, math.floor(tokens), retry_after, reset, leased}
+"""
+
+_SLIDING_LOG = """
+local limit = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local lease = tonumber(ARGV[4]) or 0
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window_ms)
+local count = redis.call('ZCARD', KEYS[1])
+
+local allowed = 0
+local retry_after = 0
+local leased = 0
+if count + cost <= limit then
+  leased = math.min(lease, limit - count - cost)
+  for i = 1, cost + leased do
+    redis.call('ZADD', KEYS[1], now, t[1] .. '.' .. t[2] .. '.' .. (count + i))
+  end
+  count = count + cost + leased
+  redis.call('PEXPIRE', KEYS[1], window_ms)
+  allowed = 1
+else
+  local needed = math.min(count + cost - limit, count)
+  if needed < 1 then
+    -- cost > limit on an empty log: it can never fit, report a full window
+    retry_after = window_ms
+  else
+    local entry = redis.call('ZRANGE', KEYS[1], needed - 1, needed - 1, 'WITHSCORES')
+    retry_after = math.max(0, tonumber(entry[2]) + window_ms - now)
+  end
+end
+
+local reset = 0
+if count > 0 then
+  local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+  reset = math.max(0, tonumber(oldest[2]) + window_ms - now)
+end
+return {allowed, math.max(limit - count, 0), retry_after, reset, leased}
+"""
+
+_SOURCES: dict[str, str] = {"token_bucket": _TOKEN_BUCKET, "sliding_log": _SLIDING_LOG}
+_scripts: dict[str, AsyncScript] = {}
 
 
 @dataclass
 class RateLimitResult:
     allowed: bool
     remaining: int
+    limit: int = 0
+    retry_after: float = 0.0
+    reset_after: float = 0.0
+    leased: int = 0
 
 
 class RateLimiter:
-    """Redis-backed fixed window rate limiter."""
+    """Redis-backed rate limiter; each check is a single atomic Lua script call.
+
+    `token_bucket` refills `limit` tokens evenly over the window, `sliding_log`
+    admits at most `limit` hits in any trailing window. Neither lets a client
+    burst 2x at a window boundary.
+    """
 
-    def __init__(self, redis_client: Redis):
+    def __init__(self, redis_client: Redis, algorithm: Algorithm = "sliding_log"):
+        if algorithm not in _SOURCES:
+            raise ValueError(f"unknown rate limit algorithm: {algorithm}")
         self.redis = redis_client
+        self.algorithm = algorithm
+
+    def _script(self) -> AsyncScript:
+        script = _scripts.get(self.algorithm)
+        if script is None:
+            script = self.redis.register_script(_SOURCES[self.algorithm])
+            _scripts[self.algorithm] = script
+        return script
+
+    async def check(
+        self,
+        key: str,
+        limit: int,
+        window_seconds: int,
+        cost: int = 1,
+        lease: int = 0,
+    ) -> RateLimitResult:
+        allowed, remaining, retry_after_ms, reset_ms, leased = await self._script()(
+            keys=[f"rl:{self.algorithm}:{key}"],
+            args=[limit, int(window_seconds * 1000), cost, lease],
+            client=self.redis,
+        )
+        return RateLimitResult(
+            allowed=bool(allowed),
+            remaining=int(remaining),
+            limit=limit,
+            retry_after=int(retry_after_ms) / 1000,
+            reset_after=int(reset_ms) / 1000,
+            leased=int(leased),
+        )
+
+
+@dataclass
+class _LocalKeyState:
+    blocked_until: float = 0.0
+    leased: int = 0
+    lease_expires: float = 0.0
+    remaining: int = 0
+    reset_at: float = 0.0
+    last_remote_at: float = 0.0
+
+
+class LocalRateLimitTier:
+    """In-process tier in front of `RateLimiter` that answers without touching Redis.
+
+    Keys Redis has rejected stay blocked locally until their `retry_after` passes,
+    and allowed checks on a hot key (one that already went to Redis within the
+    last `lease_ttl`) may lease a small batch of extra tokens that the next hits
+    on this worker spend locally. Redis charges leased tokens for the whole window
+    and unspent ones are lost when the lease expires, so sparse traffic never
+    leases and leases are only taken for generous limits; the tier can only be
+    stricter than Redis, never looser.
+    State is a size-bounded LRU, so a flood of distinct keys just falls through.
+    """
+
+    def __init__(self, *, max_keys: int, lease_size: int, lease_ttl: float):
+        self.max_keys = max_keys
+        self.lease_size = lease_size
+        self.lease_ttl = lease_ttl
+        self._keys: "OrderedDict[str, _LocalKeyState]" = OrderedDict()
+        self.local_rejects = metrics.counter("rate_limit.local_rejects")
+        self.local_admits = metrics.counter("rate_limit.local_admits")
+        self.remote_checks = metrics.counter("rate_limit.remote_checks")
+
+    def lease_for(self, key: str, limit: int) -> int:
+        state = self._keys.get(key)
+        if state is None or time.monotonic() - state.last_remote_at >= self.lease_ttl:
+            # a cold key would likely let the lease expire unspent, burning quota
+            return 0
+        # leasing on a tight limit would starve other workers
+        return min(self.lease_size, limit // 10)
+
+    def check(self, key: str, limit: int) -> RateLimitResult | None:
+        """Return a decision made locally, or None when Redis must be consulted."""
 
-    async def check(self, key: str, limit: int, window_seconds: int) -> RateLimitResult:
-        current = await self.redis.incr(key)
-        if current == 1:
-            await self.redis.expire(key, window_seconds)
+        state = self._keys.get(key)
+        if state is None:
+            return None
+        now = time.monotonic()
+        if state.blocked_until > now:
+            self.local_rejects.inc()
+            return RateLimitResult(
+                allowed=False,
+                remaining=0,
+                limit=limit,
+                retry_after=state.blocked_until - now,
+                reset_after=max(state.reset_at - now, 0.0),
+            )
+        if state.leased > 0 and state.lease_expires > now:
+            state.leased -= 1
+            self.local_admits.inc()
+            return RateLimitResult(
+                allowed=True,
+                # leased tokens are this worker's only; report what Redis has left
+                remaining=state.remaining,
+                limit=limit,
+                reset_after=max(state.reset_at - now, 0.0),
+            )
+        return None
 
-        allowed = current <= limit
-        remaining = max(limit - current, 0)
-        return RateLimitResult(allowed=allowed, remaining=remaining)
+    def record(self, key: str, result: RateLimitResult) -> None:
+        self.remote_checks.inc()
+        now = time.monotonic()
+        state = self._keys.get(key) or _LocalKeyState()
+        state.last_remote_at = now
+        state.remaining = result.remaining
+        state.reset_at = now + result.reset_after
+        if result.allowed:
+            state.blocked_until = 0.0
+            state.leased = result.leased
+            state.lease_expires = now + self.lease_ttl
+        else:
+            state.blocked_until = now + result.retry_after
+            state.leased = 0
+        # kept even without a lease: the next check uses `last_remote_at` to spot a hot key
+        self._keys[key] = state
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.max_keys:
+            self._keys.popitem(last=False)
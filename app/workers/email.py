@@ -0,0 +1,230 @@
+"""Consumer for the JSON email queue filled by `app.services.tasks.enqueue_emails`.
+
+    python -m app.workers.email --threads 4
+
+Each job is moved atomically from `jobs:email` to this worker's processing
+list and only removed after the SMTP send, so a crash never loses a message:
+on start the worker requeues whatever its previous run left in flight. The
+processing list is keyed by the worker name (`--name`/`EMAIL_WORKER_NAME`,
+default the hostname), which must be stable across restarts and unique among
+live workers; a worker waits while another live one holds its name, so a
+duplicate can never requeue jobs that are still being sent. A worker that loses
+its name (its lease expired, e.g. after a long Redis outage) stops taking jobs.
+
+A failed job is retried after an exponential backoff (parked in the
+`jobs:email:delayed` zset until due), so an SMTP outage does not burn through
+its attempts in milliseconds. Jobs that keep failing end up in `jobs:email:dead`.
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+
+from redis import Redis
+
+from app.core.logging import configure_logging
+from app.services.notifications import send_email
+from app.services.redis import get_redis
+from app.services.smtp_pool import close_smtp_pool
+from app.services.tasks import EMAIL_QUEUE_KEY, decode_email_job
+
+logger = logging.getLogger(__name__)
+
+DEAD_LETTER_KEY = f"{EMAIL_QUEUE_KEY}:dead"
+DELAYED_KEY = f"{EMAIL_QUEUE_KEY}:delayed"
+MAX_ATTEMPTS = 5
+LEASE_TTL_SECONDS = 30
+
+# Both scripts score by the Redis server clock, so workers with skewed clocks agree on due times.
+# KEYS: delayed zset; ARGV: job, delay in ms.
+_DEFER = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+return redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[1])
+"""
+
+# KEYS: delayed zset, queue; ARGV: max jobs. Moves due retries to the back of the queue.
+_PROMOTE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, tonumber(ARGV[1]))
+for _, raw in ipairs(due) do
+    redis.call('ZREM', KEYS[1], raw)
+    redis.call('LPUSH', KEYS[2], raw)
+end
+return #due
+"""
+
+# KEYS: lease; ARGV: token, ttl in ms. Only the holder may extend or drop its lease.
+_RENEW = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class EmailWorker:
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        name: str,
+        threads: int = 1,
+        poll_timeout: float = 1.0,
+        retry_base_delay: float = 5.0,
+    ):
+        self.redis = redis
+        self.name = name
+        self.threads = threads
+        self.poll_timeout = poll_timeout
+        self.retry_base_delay = retry_base_delay
+        self.processing_key = f"{EMAIL_QUEUE_KEY}:processing:{name}"
+        self.lease_key = f"{EMAIL_QUEUE_KEY}:worker:{name}"
+        self._lease_token = uuid.uuid4().hex
+        self._defer = redis.register_script(_DEFER)
+        self._promote = redis.register_script(_PROMOTE)
+        self._renew = redis.register_script(_RENEW)
+        self._release = redis.register_script(_RELEASE)
+        self._promoted_at = 0.0
+        self._stop = threading.Event()
+        self.sent = 0
+        self.failed = 0
+
+    def acquire_name(self) -> None:
+        """Claim the worker name, waiting while another live worker still holds it."""
+
+        waiting = False
+        while not self.redis.set(self.lease_key, self._lease_token, nx=True, ex=LEASE_TTL_SECONDS):
+            if not waiting:
+                logger.warning("worker name %r is held by a live worker; waiting for it to be released", self.name)
+                waiting = True
+            if self._stop.wait(LEASE_TTL_SECONDS / 6):
+                return
+
+    def _keep_name(self) -> None:
+        """Renew the name lease until stopped; stop the worker if the lease was lost."""
+
+        interval = LEASE_TTL_SECONDS / 3
+        while not self._stop.wait(interval):
+            try:
+                renewed = self._renew(keys=[self.lease_key], args=[self._lease_token, int(LEASE_TTL_SECONDS * 1000)])
+            except Exception:
+                # a dead lease thread would let the name expire under a running worker
+                interval = LEASE_TTL_SECONDS / 10
+                logger.exception("could not renew the worker name lease; retrying in %.0fs", interval)
+                continue
+            if not renewed:
+                logger.error("lease on worker name %r expired or was taken over; stopping", self.name)
+                self.stop()
+                return
+            interval = LEASE_TTL_SECONDS / 3
+
+    def release_name(self) -> None:
+        self._release(keys=[self.lease_key], args=[self._lease_token])
+
+    def recover(self) -> int:
+        """Requeue jobs a previous run of this worker took but never finished."""
+
+        moved = 0
+        while self.redis.lmove(self.processing_key, EMAIL_QUEUE_KEY, "RIGHT", "RIGHT") is not None:
+            moved += 1
+        if moved:
+            logger.warning("requeued %d unfinished email jobs", moved)
+        return moved
+
+    def run(self) -> None:
+        self.acquire_name()
+        if self._stop.is_set():
+            return
+        try:
+            self.recover()
+            workers = [threading.Thread(target=self._loop, name=f"email-{i}") for i in range(self.threads)]
+            workers.append(threading.Thread(target=self._keep_name, name="email-lease", daemon=True))
+            for thread in workers:
+                thread.start()
+            for thread in workers[:-1]:
+                thread.join()
+        finally:
+            self.release_name()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def promote_due(self) -> int:
+        """Move retries whose backoff has elapsed back onto the queue."""
+
+        self._promoted_at = time.monotonic()
+        return self._promote(keys=[DELAYED_KEY, EMAIL_QUEUE_KEY], args=[100])
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            if time.monotonic() - self._promoted_at >= self.poll_timeout:
+                self.promote_due()
+            raw = self.redis.blmove(EMAIL_QUEUE_KEY, self.processing_key, self.poll_timeout, "RIGHT", "LEFT")
+            if raw is not None:
+                self.process(raw)
+
+    def process(self, raw: str) -> None:
+        try:
+            job = decode_email_job(raw)
+            send_email(job["to"], job["subject"], job["body"])
+        except Exception:
+            logger.exception("email job failed")
+            self.failed += 1
+            self._retry_or_bury(raw)
+        else:
+            self.sent += 1
+        self.redis.lrem(self.processing_key, 1, raw)
+
+    def _retry_or_bury(self, raw: str) -> None:
+        try:
+            job = json.loads(raw)
+            job["attempts"] = job.get("attempts", 0) + 1
+        except ValueError:
+            self.redis.lpush(DEAD_LETTER_KEY, raw)
+            return
+        if job["attempts"] >= MAX_ATTEMPTS:
+            self.redis.lpush(DEAD_LETTER_KEY, json.dumps(job, separators=(",", ":")))
+            return
+        # identical emails must not collapse into one zset member
+        job["retry_id"] = uuid.uuid4().hex[:8]
+        delay = self.retry_base_delay * 4 ** (job["attempts"] - 1)
+        self._defer(keys=[DELAYED_KEY], args=[json.dumps(job, separators=(",", ":")), int(delay * 1000)])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Send emails from the JSON job queue.")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent sends (match SMTP_POOL_SIZE)")
+    parser.add_argument(
+        "--name",
+        default=os.getenv("EMAIL_WORKER_NAME") or socket.gethostname(),
+        help="stable across restarts and unique among running workers (default: hostname)",
+    )
+    args = parser.parse_args()
+
+    configure_logging()
+    worker = EmailWorker(get_redis(), name=args.name, threads=args.threads)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    try:
+        worker.run()
+    finally:
+        close_smtp_pool()
+
+
+if __name__ == "__main__":
+    main()
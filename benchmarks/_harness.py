@@ -0,0 +1,50 @@
+"""Shared setup for the benchmark scripts: temp SQLite database + fakeredis."""
+
+import os
+import statistics
+import tempfile
+
+import fakeredis
+
+from app.core import config as config_module
+from app.db import session as session_module
+from app.db.base import Base
+from app.db.deps import get_db
+from app.main import app
+from app.services import redis as redis_service
+
+
+async def setup_local_stack() -> None:
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmpdir}/bench.db"
+    config_module.get_settings.cache_clear()
+    session_module.reset_engine()
+    async with session_module.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    fake_server = fakeredis.FakeServer()
+    redis_service.override_redis(
+        fakeredis.FakeRedis(server=fake_server, decode_responses=True),
+        fakeredis.aioredis.FakeRedis(server=fake_server, decode_responses=True),
+    )
+
+    async def override_get_db():
+        async with session_module.SessionLocal() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(label: str, samples_ms: list[float]) -> str:
+    return (
+        f"{label:<28} n={len(samples_ms):<6} "
+        f"p50={statistics.median(samples_ms):8.2f}ms "
+        f"p99={percentile(samples_ms, 99):8.2f}ms "
+        f"max={max(samples_ms):8.2f}ms"
+    )
@@ -0,0 +1,94 @@
+"""Course detail load time for a 500-lesson course: three round trips vs one query.
+
+The "legacy" loader replays what `GET /courses/{slug}` used to do (course,
+published lessons, completed count, without per-lesson progress); the new one
+is `courses_crud.get_course_detail`. `--rtt-ms` adds a simulated network round
+trip to every statement, which is where the single query pays off on a remote
+Postgres.
+
+    python -m benchmarks.course_detail --lessons 500 --iterations 200 --rtt-ms 1
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import event, func, select
+
+from app.crud import courses as courses_crud
+from app.db import session as session_module
+from app.models.course import Course, Lesson
+from app.models.progress import LessonProgress
+from app.models.user import User
+from benchmarks._harness import setup_local_stack, summarize
+
+
+async def _seed(lessons: int) -> int:
+    async with session_module.SessionLocal() as session:
+        user = User(email="detail@example.com", password_hash="x")
+        course = Course(title="Big", slug="big", visibility="public", published_lessons_count=lessons)
+        session.add_all([user, course])
+        await session.flush()
+        rows = [
+            Lesson(course_id=course.id, index=i, title=f"L{i}", content_url=f"https://cdn/{i}", published=True)
+            for i in range(lessons)
+        ]
+        session.add_all(rows)
+        await session.flush()
+        session.add_all(
+            LessonProgress(user_id=user.id, lesson_id=lesson.id, status="done", percent=100)
+            for lesson in rows[: lessons // 2]
+        )
+        await session.commit()
+        return user.id
+
+
+async def _legacy(user_id: int) -> None:
+    async with session_module.SessionLocal() as session:
+        course = await courses_crud.get_by_slug(session, "big")
+        await courses_crud.list_published_lessons(session, course.id)
+        await session.scalar(
+            select(func.count())
+            .select_from(LessonProgress)
+            .join(Lesson, Lesson.id == LessonProgress.lesson_id)
+            .where(Lesson.course_id == course.id, LessonProgress.user_id == user_id, LessonProgress.status == "done")
+        )
+
+
+async def _single(user_id: int) -> None:
+    async with session_module.SessionLocal() as session:
+        await courses_crud.get_course_detail(session, "big", user_id=user_id)
+
+
+async def _measure(loader, user_id: int, iterations: int) -> list[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await loader(user_id)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lessons", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    await setup_local_stack()
+    user_id = await _seed(args.lessons)
+    if args.rtt_ms:
+        event.listen(
+            session_module.engine.sync_engine,
+            "before_cursor_execute",
+            lambda *_: time.sleep(args.rtt_ms / 1000),
+        )
+    await _single(user_id)  # warm the compiled statement cache
+    await _legacy(user_id)
+    print(summarize("legacy (3 queries)", await _measure(_legacy, user_id, args.iterations)))
+    print(summarize("single query + progress", await _measure(_single, user_id, args.iterations)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
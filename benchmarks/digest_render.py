@@ -0,0 +1,48 @@
+"""Render 100k weekly digests: per-call lookup with auto-reload vs `render_many`.
+
+The baseline mirrors the old environment (`auto_reload` on, so every
+`get_template` stats the file) rendering one recipient per call.
+
+    python -m benchmarks.digest_render --digests 100000
+"""
+
+import argparse
+import time
+
+from jinja2 import Environment, PackageLoader, select_autoescape
+
+from app.services.notifications import render_many, warm_templates
+
+
+def _contexts(count: int, courses: int):
+    for user in range(count):
+        yield {"courses": [{"title": f"Course {c}", "progress": (user + c) % 101} for c in range(courses)]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--digests", type=int, default=100000)
+    parser.add_argument("--courses", type=int, default=5)
+    args = parser.parse_args()
+
+    legacy_env = Environment(loader=PackageLoader("app", "templates"), autoescape=select_autoescape(["html", "txt"]))
+    started = time.perf_counter()
+    for context in _contexts(args.digests, args.courses):
+        legacy_env.get_template("weekly_digest.html").render(**context)
+    legacy = time.perf_counter() - started
+
+    started = time.perf_counter()
+    warm_templates()
+    warm = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in render_many("weekly_digest.html", _contexts(args.digests, args.courses)):
+        pass
+    batched = time.perf_counter() - started
+
+    print(f"warm-up (compile all templates)   {warm * 1000:8.1f}ms")
+    for label, elapsed in (("per-call lookup, auto_reload", legacy), ("render_many, cached", batched)):
+        print(f"{label:<34} {args.digests} digests in {elapsed:6.2f}s = {args.digests / elapsed:8.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
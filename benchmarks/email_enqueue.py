@@ -0,0 +1,76 @@
+"""Email enqueue throughput: RQ through the thread pool vs the async JSON queue.
+
+Uses fakeredis unless `--redis-url` points at a real server (where the saved
+round trips matter much more than here).
+
+    python -m benchmarks.email_enqueue --jobs 10000
+    python -m benchmarks.email_enqueue --jobs 10000 --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import fakeredis
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+from app.core import config as config_module
+from app.services import redis as redis_service
+from app.services import tasks
+
+JOB = ("learner@example.com", "Your weekly digest", "<p>" + "lesson update " * 40 + "</p>")
+
+
+def _use_backend(backend: str) -> None:
+    os.environ["EMAIL_QUEUE_BACKEND"] = backend
+    config_module.get_settings.cache_clear()
+
+
+async def _timed(label: str, jobs: int, run) -> None:
+    started = time.perf_counter()
+    await run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<30} {jobs} jobs in {elapsed:6.2f}s = {jobs / elapsed:9.0f} jobs/s")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    if args.redis_url:
+        sync_client = Redis.from_url(args.redis_url, decode_responses=True)
+        async_client = AsyncRedis.from_url(args.redis_url, decode_responses=True)
+    else:
+        server = fakeredis.FakeServer()
+        sync_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+        async_client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    redis_service.override_redis(sync_client, async_client)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_by_one() -> None:
+        async def enqueue() -> None:
+            async with semaphore:
+                await tasks.enqueue_email(*JOB)
+
+        await asyncio.gather(*(enqueue() for _ in range(args.jobs)))
+
+    async def bulk() -> None:
+        await tasks.enqueue_emails([JOB] * args.jobs)
+
+    _use_backend("rq")
+    await _timed("rq, one job per call", args.jobs, one_by_one)
+    _use_backend("redis_list")
+    await _timed("json list, one job per call", args.jobs, one_by_one)
+    await _timed("json list, bulk pipeline", args.jobs, bulk)
+
+    sync_client.delete("rq:queue:emails", tasks.EMAIL_QUEUE_KEY)
+    await async_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""p99 latency of `GET /courses` while a burst of logins is in flight.
+
+Runs the same workload twice: bcrypt inline on the event loop (the old
+behaviour, `PASSWORD_HASH_WORKERS=0`) and offloaded to the hashing pool.
+
+    python -m benchmarks.login_latency --logins 200 --probes 200
+"""
+
+import argparse
+import asyncio
+import time
+
+from httpx import ASGITransport, AsyncClient
+
+from app.core.security import get_password_hash
+from app.db import session as session_module
+from app.main import app
+from app.models.user import User
+from app.services import passwords as passwords_service
+from app.services.passwords import PasswordHasher
+from benchmarks._harness import setup_local_stack, summarize
+
+
+async def _seed_users(count: int) -> list[str]:
+    password_hash = get_password_hash("benchpassword")
+    emails = [f"bench{i}@example.com" for i in range(count)]
+    async with session_module.SessionLocal() as session:
+        session.add_all(User(email=email, password_hash=password_hash) for email in emails)
+        await session.commit()
+    return emails
+
+
+async def _run(emails: list[str], probes: int, concurrency: int, workers: int) -> list[float]:
+    settings = passwords_service.get_settings()
+    passwords_service._hasher = PasswordHasher(
+        max_workers=workers,
+        max_pending=len(emails),
+        rounds=settings.bcrypt_rounds,
+    )
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def login(email: str) -> None:
+            async with semaphore:
+                await client.post("/auth/login", json={"email": email, "password": "benchpassword"})
+
+        async def probe() -> list[float]:
+            samples = []
+            for _ in range(probes):
+                started = time.perf_counter()
+                await client.get("/courses")
+                samples.append((time.perf_counter() - started) * 1000)
+            return samples
+
+        login_tasks = [asyncio.create_task(login(email)) for email in emails]
+        await asyncio.sleep(0)
+        samples = await probe()
+        await asyncio.gather(*login_tasks)
+    passwords_service.shutdown_password_hasher()
+    return samples
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    await setup_local_stack()
+    emails = await _seed_users(args.logins * 2)
+    before = await _run(emails[: args.logins], args.probes, args.concurrency, workers=0)
+    after = await _run(emails[args.logins :], args.probes, args.concurrency, workers=args.workers)
+    print(summarize("/courses, inline bcrypt", before))
+    print(summarize(f"/courses, pool({args.workers})", after))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
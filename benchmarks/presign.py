@@ -0,0 +1,67 @@
+"""Sign lesson asset URLs: per-request threadpool signing vs local cached signing.
+
+The baseline mirrors the old `/storage/sign` path: every call goes through
+`run_in_threadpool` and computes a fresh SigV4 signature. Both clients have a
+region configured, so neither side includes the bucket-region lookup an
+unconfigured client makes on first use (that is pure extra latency on top).
+
+    python -m benchmarks.presign --requests 100000 --keys 200
+"""
+
+import argparse
+import asyncio
+from datetime import timedelta
+import time
+
+from fastapi.concurrency import run_in_threadpool
+from minio import Minio
+
+from app.core.config import get_settings
+from app.services import storage as storage_service
+
+
+async def _threadpool(client: Minio, keys: list[str], requests: int) -> float:
+    bucket = get_settings().s3_bucket
+    started = time.perf_counter()
+    for i in range(requests):
+        await run_in_threadpool(
+            client.get_presigned_url, "GET", bucket, keys[i % len(keys)], timedelta(minutes=5)
+        )
+    return time.perf_counter() - started
+
+
+def _uncached(keys: list[str], requests: int) -> float:
+    cache = storage_service.PresignedUrlCache(max_size=0, bucket_seconds=60)
+    started = time.perf_counter()
+    for i in range(requests):
+        cache.get(keys[i % len(keys)], timedelta(minutes=5))
+    return time.perf_counter() - started
+
+
+def _cached(keys: list[str], requests: int) -> float:
+    storage_service.get_presigned_url_cache().clear()
+    started = time.perf_counter()
+    for i in range(requests):
+        storage_service.generate_presigned_url(keys[i % len(keys)], timedelta(minutes=5))
+    return time.perf_counter() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--keys", type=int, default=200, help="distinct assets (a popular course's lessons)")
+    args = parser.parse_args()
+
+    client = storage_service.get_client()
+    keys = [f"courses/demo/lesson-{i}.mp4" for i in range(args.keys)]
+    results = (
+        ("threadpool, signed per request", await _threadpool(client, keys, args.requests)),
+        ("inline, signed per request", _uncached(keys, args.requests)),
+        ("inline, cached per time bucket", _cached(keys, args.requests)),
+    )
+    for label, elapsed in results:
+        print(f"{label:<32} {args.requests} urls in {elapsed:6.2f}s = {args.requests / elapsed:9.0f}/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""Email delivery throughput: one SMTP connection per message vs the pooled sender.
+
+Runs against a local aiosmtpd sink, so the numbers measure connection setup and
+protocol overhead rather than a real relay (which adds TLS and auth per connect,
+widening the gap).
+
+    python -m benchmarks.smtp_throughput --messages 10000 --threads 4
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import smtplib
+import socket
+import time
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.handlers import Sink
+
+from app.services.smtp_pool import SMTPConnectionPool
+
+MESSAGE = "Subject: Weekly digest\nContent-Type: text/html\n\n<p>Hello!</p>"
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _connection_per_message(host: str, port: int) -> None:
+    with smtplib.SMTP(host, port) as smtp:
+        smtp.sendmail("noreply@example.com", ["learner@example.com"], MESSAGE)
+
+
+def _run(label: str, send, messages: int, threads: int) -> None:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for future in [executor.submit(send) for _ in range(messages)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {messages} messages in {elapsed:6.2f}s = {messages / elapsed:8.0f} msg/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--max-messages-per-connection", type=int, default=100)
+    args = parser.parse_args()
+    logging.getLogger("mail.log").setLevel(logging.WARNING)
+
+    controller = Controller(Sink(), hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    host, port = controller.hostname, controller.port
+    try:
+        _run("connection per message", lambda: _connection_per_message(host, port), args.messages, args.threads)
+        pool = SMTPConnectionPool(
+            host,
+            port,
+            max_size=args.threads,
+            max_messages=args.max_messages_per_connection,
+        )
+        _run(
+            f"pooled ({args.threads} connections)",
+            lambda: pool.send("noreply@example.com", ["learner@example.com"], MESSAGE),
+            args.messages,
+            args.threads,
+        )
+        print(f"pool opened {pool.connects.value} connections")
+        pool.close()
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
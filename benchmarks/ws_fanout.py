@@ -0,0 +1,86 @@
+"""Load-test harness for WebSocket chat fan-out against a running API + Redis.
+
+Opens many sockets on one channel, then reports what Redis sees (client
+connections, pattern subscriptions, memory) and how long one published event
+takes to reach every socket. Tokens are minted locally, so the API must run
+with the same JWT settings. The channel must already exist unless `--user-id`
+is an admin, whose first join creates it.
+
+    ulimit -n 65536
+    python -m benchmarks.ws_fanout --url ws://localhost:8000 --user-id 1 --sockets 10000
+
+Compare against the pre-hub code (one pubsub connection per socket) by
+running the same command on an older checkout of the API.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import websockets
+from redis.asyncio import Redis
+
+from app.core.security import create_access_token
+from benchmarks._harness import summarize
+
+
+async def redis_stats(redis: Redis) -> dict:
+    clients = await redis.info("clients")
+    memory = await redis.info("memory")
+    return {
+        "connected_clients": clients["connected_clients"],
+        "pubsub_patterns": await redis.pubsub_numpat(),
+        "pubsub_channels": len(await redis.pubsub_channels()),
+        "used_memory_human": memory["used_memory_human"],
+        "client_output_buffers": clients.get("client_recent_max_output_buffer"),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="ws://localhost:8000")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--user-id", default="1")
+    parser.add_argument("--channel", default="loadtest")
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    redis = Redis.from_url(args.redis_url, decode_responses=True)
+    print("before:", await redis_stats(redis))
+
+    token = create_access_token(args.user_id)
+    url = f"{args.url}/ws/channels/{args.channel}?token={token}"
+    semaphore = asyncio.Semaphore(args.connect_concurrency)
+
+    async def connect():
+        async with semaphore:
+            return await websockets.connect(url, max_queue=None, open_timeout=60)
+
+    started = time.perf_counter()
+    sockets = await asyncio.gather(*(connect() for _ in range(args.sockets)))
+    print(f"connected {len(sockets)} sockets in {time.perf_counter() - started:.1f}s")
+    # subscription happens after the handshake; give the server a moment to register
+    await asyncio.sleep(2)
+    print("connected:", await redis_stats(redis))
+
+    sent_at = time.perf_counter()
+    event = {"type": "loadtest.ping", "payload": {"sent_at": sent_at}}
+    await redis.publish(f"channel:{args.channel}", json.dumps(event))
+
+    async def receive(ws) -> float:
+        await ws.recv()
+        return (time.perf_counter() - sent_at) * 1000
+
+    latencies = await asyncio.gather(*(receive(ws) for ws in sockets))
+    print(summarize("fan-out delivery", latencies))
+
+    await asyncio.gather(*(ws.close() for ws in sockets))
+    await asyncio.sleep(1)
+    print("after close:", await redis_stats(redis))
+    await redis.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,6 +1,14 @@
+import json
+import time
+
+import jwt
 import pytest
 
-from app.core.security import decode_token
+from app.core import security
+from app.core.config import Settings
+from app.core.security import create_access_token, decode_token
+from app.services import passwords as passwords_service
+from app.services.passwords import PasswordHasher
 
 
 @pytest.mark.asyncio
@@ -18,3 +26,62 @@ async def test_register_login_refresh(client):
 
     res = await client.post("/auth/refresh", json={"refresh": tokens["refresh"]})
     assert res.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_when_cost_changes(client, user_factory, db_session, monkeypatch):
+    user = await user_factory("rehash@example.com", "password123")
+    assert user.password_hash.startswith("$2b$12$")
+    monkeypatch.setattr(
+        passwords_service,
+        "_hasher",
+        PasswordHasher(max_workers=1, max_pending=4, rounds=4),
+    )
+
+    res = await client.post("/auth/login", json={"email": "rehash@example.com", "password": "password123"})
+    assert res.status_code == 200
+    await db_session.refresh(user)
+    assert user.password_hash.startswith("$2b$04$")
+
+
+@pytest.mark.asyncio
+async def test_hasher_sheds_load_when_queue_full(client, monkeypatch):
+    monkeypatch.setattr(
+        passwords_service,
+        "_hasher",
+        PasswordHasher(max_workers=1, max_pending=0, rounds=4),
+    )
+
+    res = await client.post("/auth/register", json={"email": "busy@example.com", "password": "supersecret"})
+    assert res.status_code == 503
+    assert res.headers["retry-after"] == "1"
+
+
+def test_decode_token_cache_and_key_rotation(monkeypatch):
+    ring = security._KeyRing(
+        Settings(jwt_secret="current-secret", jwt_kid="current", jwt_verify_keys=json.dumps({"old": "old-secret"}))
+    )
+    monkeypatch.setattr(security, "_keyring", ring)
+    monkeypatch.setattr(security, "_token_cache", security._VerifiedTokenCache(max_size=16))
+
+    now = int(time.time())
+    old_token = jwt.encode(
+        {"sub": "7", "type": "access", "iat": now, "exp": now + 60},
+        "old-secret",
+        algorithm="HS256",
+        headers={"kid": "old"},
+    )
+    assert decode_token(old_token)["sub"] == "7"
+    assert jwt.get_unverified_header(create_access_token("8"))["kid"] == "current"
+
+    calls = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(jwt, "decode", lambda *args, **kwargs: calls.append(1) or real_decode(*args, **kwargs))
+    assert decode_token(old_token)["sub"] == "7"
+    assert calls == []
+
+    expired = jwt.encode({"sub": "7", "iat": now, "exp": now + 1}, "current-secret", algorithm="HS256")
+    decode_token(expired)
+    monkeypatch.setattr(time, "time", lambda: now + 5)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        decode_token(expired)
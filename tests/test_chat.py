@@ -1,17 +1,31 @@
 import asyncio
+from datetime import datetime
 import json
+import time
 
 import pytest
+from fastapi import WebSocketDisconnect
 from fastapi.testclient import TestClient
+from sqlalchemy import select
 
 from app.core.security import create_access_token
+from app.db import session as session_module
+from app.db.uow import checkout_wait_ms
 from app.main import app
+from app.models.chat import Channel, Message
 from app.models.user import UserRole
+from app.services.chat import ChannelInfo, ChannelRegistry, get_channel_registry, invalidate_channel, resolve_channel
+from app.services.fanout import ChannelSubscriber, SlowConsumer, get_channel_hub
+from app.services import fanout as fanout_module, invalidation as invalidation_module
+from app.services.ingest import get_message_ingestor
+from app.services.redis import get_async_redis, get_redis
 
 
 @pytest.mark.asyncio
-async def test_chat_message_lifecycle(user_factory):
+async def test_chat_message_lifecycle(user_factory, db_session):
     user = await user_factory("chat@example.com", "password123", role=UserRole.MEMBER)
+    db_session.add(Channel(slug="hq"))
+    await db_session.commit()
     token = create_access_token(str(user.id))
     message = {
         "type": "message.create",
@@ -28,3 +42,305 @@ async def test_chat_message_lifecycle(user_factory):
     data = await asyncio.to_thread(websocket_flow)
     assert data["type"] == "message.created"
     assert data["payload"]["text"] == "hi there"
+
+
+@pytest.mark.asyncio
+async def test_channel_history_pagination_and_threads(client, user_factory, db_session):
+    user = await user_factory("history@example.com", "password123")
+    headers = {"Authorization": f"Bearer {create_access_token(str(user.id))}"}
+    channel = Channel(slug="history")
+    db_session.add(channel)
+    await db_session.flush()
+    top = [Message(channel_id=channel.id, user_id=user.id, text=f"m{i}") for i in range(5)]
+    db_session.add_all(top)
+    await db_session.flush()
+    top[1].deleted_at = datetime.utcnow()
+    db_session.add_all(
+        [Message(channel_id=channel.id, user_id=user.id, parent_id=top[4].id, text=f"r{i}") for i in range(3)]
+    )
+    await db_session.commit()
+
+    res = await client.get(
+        "/channels/history/messages",
+        params={"limit": 2, "expand_threads": True, "replies_limit": 2},
+        headers=headers,
+    )
+    assert res.status_code == 200
+    page = res.json()
+    assert [item["text"] for item in page["items"]] == ["m4", "m3"]
+    assert [reply["text"] for reply in page["items"][0]["replies"]] == ["r0", "r1"]
+
+    res = await client.get(
+        "/channels/history/messages",
+        params={"limit": 2, "before": page["next_cursor"]},
+        headers=headers,
+    )
+    page = res.json()
+    assert [item["text"] for item in page["items"]] == ["m2", "m0"]
+
+    res = await client.get(
+        "/channels/history/messages",
+        params={"parent_id": top[4].id},
+        headers=headers,
+    )
+    assert [item["text"] for item in res.json()["items"]] == ["r2", "r1", "r0"]
+    assert res.json()["next_cursor"] is None
+
+    res = await client.get("/channels/missing/messages", headers=headers)
+    assert res.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_sockets_share_one_redis_subscription(user_factory, db_session):
+    user = await user_factory("fanout@example.com", "password123", role=UserRole.MEMBER)
+    db_session.add(Channel(slug="lobby"))
+    await db_session.commit()
+    token = create_access_token(str(user.id))
+    message = {"type": "message.create", "payload": {"text": "to everyone"}}
+
+    def websocket_flow():
+        with TestClient(app) as sync_client:
+            url = f"/ws/channels/lobby?token={token}"
+            with sync_client.websocket_connect(url) as first, sync_client.websocket_connect(url) as second:
+                for _ in range(100):
+                    if get_channel_hub().refcount("lobby") == 2:
+                        break
+                    time.sleep(0.01)
+                first.send_text(json.dumps(message))
+                events = json.loads(first.receive_text()), json.loads(second.receive_text())
+                return (get_channel_hub().refcount("lobby"), get_redis().pubsub_numpat()), *events
+
+    (refcount, numpat), first_event, second_event = await asyncio.to_thread(websocket_flow)
+    assert refcount == 2
+    assert numpat == 1
+    assert first_event == second_event
+    assert first_event["payload"]["text"] == "to everyone"
+
+
+@pytest.mark.asyncio
+async def test_subscriber_overflow_policies():
+    def event(kind, message_id):
+        return json.dumps({"type": kind, "payload": {"id": message_id}})
+
+    dropping = ChannelSubscriber("hq", max_queue=2, overflow="drop_oldest")
+    dropping.offer(event("message.created", 0))
+    dropping.reply(event("message.ack", 10))
+    for message_id in range(1, 4):
+        dropping.offer(event("message.created", message_id))
+    # replies are never evicted and jump ahead of fan-out traffic
+    assert [json.loads(await dropping.get())["payload"]["id"] for _ in range(3)] == [10, 2, 3]
+    assert dropping.dropped == 2
+
+    coalescing = ChannelSubscriber("hq", max_queue=2, overflow="coalesce")
+    coalescing.offer(event("message.pinned", 1))
+    coalescing.offer(event("message.created", 2))
+    coalescing.offer(json.dumps({"type": "message.pinned", "payload": {"id": 1, "pinned": False}}))
+    assert json.loads(await coalescing.get())["payload"] == {"id": 1, "pinned": False}
+    assert (coalescing.coalesced, coalescing.dropped, coalescing.depth) == (1, 0, 1)
+
+    strict = ChannelSubscriber("hq", max_queue=1, overflow="disconnect")
+    strict.offer(event("message.created", 1))
+    strict.offer(event("message.created", 2))
+    with pytest.raises(SlowConsumer):
+        await strict.get()
+
+
+@pytest.mark.asyncio
+async def test_channel_hub_resubscribes_after_listener_crash(monkeypatch):
+    monkeypatch.setattr(fanout_module, "RECONNECT_MIN_SECONDS", 0.01)
+    hub = fanout_module.ChannelHub(max_queue=10, overflow="drop_oldest")
+    subscribed = []
+    real_psubscribe = hub._psubscribe
+
+    async def psubscribe():
+        pubsub = await real_psubscribe()
+        subscribed.append(pubsub)
+        return pubsub
+
+    monkeypatch.setattr(hub, "_psubscribe", psubscribe)
+    subscriber = await hub.subscribe("hq")
+    real_offer = subscriber.offer
+    crashed = []
+
+    def offer(data):
+        if not crashed:
+            crashed.append(data)
+            raise RuntimeError("decoder blew up")
+        real_offer(data)
+
+    monkeypatch.setattr(subscriber, "offer", offer)
+    try:
+        await get_async_redis().publish("channel:hq", "lost")
+        for _ in range(100):
+            if len(subscribed) == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert crashed == ["lost"]
+        assert len(subscribed) == 2  # re-subscribed from within the listener task
+        await get_async_redis().publish("channel:hq", "delivered")
+        assert await asyncio.wait_for(subscriber.get(), 1) == "delivered"
+        assert hub.refcount("hq") == 1
+    finally:
+        await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_burst_is_batched_and_acknowledged(user_factory, db_session, monkeypatch):
+    user = await user_factory("burst@example.com", "password123", role=UserRole.MEMBER)
+    db_session.add(Channel(slug="burst"))
+    await db_session.commit()
+    token = create_access_token(str(user.id))
+    monkeypatch.setattr(get_message_ingestor(), "flush_interval", 0.05)
+    batches_before = get_message_ingestor().batch_sizes.count
+
+    def websocket_flow():
+        with TestClient(app) as sync_client:
+            with sync_client.websocket_connect(f"/ws/channels/burst?token={token}") as ws:
+                for index in range(3):
+                    ws.send_text(
+                        json.dumps({"type": "message.create", "payload": {"text": f"line {index}", "client_id": f"c{index}"}})
+                    )
+                return [json.loads(ws.receive_text()) for _ in range(6)]
+
+    events = await asyncio.to_thread(websocket_flow)
+    acks = {event["payload"]["client_id"]: event["payload"]["id"] for event in events if event["type"] == "message.ack"}
+    created = {event["payload"]["text"]: event["payload"]["id"] for event in events if event["type"] == "message.created"}
+    assert sorted(acks) == ["c0", "c1", "c2"]
+    assert [acks[f"c{i}"] for i in range(3)] == [created[f"line {i}"] for i in range(3)]
+    assert acks["c0"] < acks["c1"] < acks["c2"]
+    assert get_message_ingestor().batch_sizes.count - batches_before < 3
+
+
+@pytest.mark.asyncio
+async def test_unexpected_ingest_failure_is_reported(user_factory, db_session, monkeypatch):
+    user = await user_factory("ingest-fail@example.com", "password123", role=UserRole.MEMBER)
+    db_session.add(Channel(slug="broken"))
+    await db_session.commit()
+    token = create_access_token(str(user.id))
+
+    async def broken_submit(**kwargs):
+        raise RuntimeError("ingestor down")
+
+    monkeypatch.setattr(get_message_ingestor(), "submit", broken_submit)
+
+    def websocket_flow():
+        with TestClient(app) as sync_client:
+            with sync_client.websocket_connect(f"/ws/channels/broken?token={token}") as ws:
+                ws.send_text(json.dumps({"type": "message.create", "payload": {"text": "lost?", "client_id": "x1"}}))
+                return json.loads(ws.receive_text())
+
+    reply = await asyncio.to_thread(websocket_flow)
+    assert reply == {"type": "message.error", "payload": {"client_id": "x1", "detail": "rejected"}}
+
+
+@pytest.mark.asyncio
+async def test_channel_registry_race_and_invalidation(db_session):
+    async def join(create=True):
+        async with session_module.SessionLocal() as session:
+            return await resolve_channel(session, "racy", create=create)
+
+    assert await join(create=False) is None
+    first, second = await asyncio.gather(join(), join())
+    assert first.id == second.id
+    assert get_channel_registry().get("racy") is not None
+
+    channel = await db_session.scalar(select(Channel).where(Channel.slug == "racy"))
+    channel.is_readonly = True
+    await db_session.commit()
+    assert (await join()).is_readonly is False  # still served from the registry
+
+    await invalidate_channel("racy")
+    assert get_channel_registry().get("racy") is None
+    assert (await join()).is_readonly is True
+
+
+def test_channel_registry_is_bounded():
+    registry = ChannelRegistry(max_size=2)
+    for index, slug in enumerate(["a", "b", "c"]):
+        if slug == "c":
+            registry.get("a")  # recently used, so "b" is evicted instead
+        registry.put(ChannelInfo(id=index, slug=slug, is_readonly=False))
+    assert len(registry) == 2
+    assert (registry.get("a"), registry.get("b")) == (ChannelInfo(0, "a", False), None)
+
+
+@pytest.mark.asyncio
+async def test_members_cannot_open_unknown_channels(user_factory, db_session):
+    user = await user_factory("wanderer@example.com", "password123", role=UserRole.MEMBER)
+    token = create_access_token(str(user.id))
+
+    def websocket_flow():
+        with TestClient(app) as sync_client:
+            with sync_client.websocket_connect(f"/ws/channels/made-up?token={token}") as ws:
+                with pytest.raises(WebSocketDisconnect) as exc:
+                    ws.receive_text()
+                return exc.value.code
+
+    assert await asyncio.to_thread(websocket_flow) == 4404
+    assert await db_session.scalar(select(Channel).where(Channel.slug == "made-up")) is None
+
+
+@pytest.mark.asyncio
+async def test_invalidation_bus_survives_redis_being_down_at_boot(monkeypatch):
+    real_redis = invalidation_module.get_async_redis
+    attempts = []
+
+    class DownPubSub:
+        async def subscribe(self, *channels):
+            raise ConnectionError("redis down")
+
+        async def unsubscribe(self, *channels):
+            pass
+
+        async def aclose(self):
+            pass
+
+    class FlakyRedis:
+        def pubsub(self):
+            attempts.append(1)
+            return DownPubSub() if len(attempts) == 1 else real_redis().pubsub()
+
+    monkeypatch.setattr(invalidation_module, "get_async_redis", FlakyRedis)
+    monkeypatch.setattr(invalidation_module, "RECONNECT_MIN_SECONDS", 0.01)
+    bus = invalidation_module.InvalidationBus()
+    seen = []
+    bus.register("t", seen.append)
+    await asyncio.wait_for(bus.start(), 1)  # does not hang on the failed subscribe
+    try:
+        for _ in range(100):
+            if bus._subscribed:
+                break
+            await asyncio.sleep(0.01)
+        assert len(attempts) == 2
+        await real_redis().publish(invalidation_module.INVALIDATION_CHANNEL, json.dumps({"topic": "t", "key": "k"}))
+        for _ in range(100):
+            if seen:
+                break
+            await asyncio.sleep(0.01)
+        assert seen == ["k"]
+    finally:
+        await bus.stop()
+
+
+@pytest.mark.asyncio
+async def test_socket_frames_share_one_session(user_factory):
+    user = await user_factory("moderator@example.com", "password123", role=UserRole.ADMIN)
+    token = create_access_token(str(user.id))
+    checkouts_before = checkout_wait_ms.count
+
+    def websocket_flow():
+        with TestClient(app) as sync_client:
+            with sync_client.websocket_connect(f"/ws/channels/mods?token={token}") as ws:
+                ws.send_text(json.dumps({"type": "message.create", "payload": {"text": "pin me", "client_id": "m1"}}))
+                events = [json.loads(ws.receive_text()) for _ in range(2)]
+                message_id = next(e["payload"]["id"] for e in events if e["type"] == "message.ack")
+                ws.send_text(json.dumps({"type": "message.pin", "payload": {"id": message_id}}))
+                ws.send_text(json.dumps({"type": "message.delete", "payload": {"id": message_id}}))
+                ws.send_text(json.dumps({"type": "message.delete", "payload": {"id": 999999}}))
+                return [json.loads(ws.receive_text()) for _ in range(3)]
+
+    events = await asyncio.to_thread(websocket_flow)
+    assert {event["type"] for event in events} == {"message.pinned", "message.deleted", "message.error"}
+    error = next(event for event in events if event["type"] == "message.error")
+    assert error["payload"]["id"] == 999999
+    assert checkout_wait_ms.count > checkouts_before
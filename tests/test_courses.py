@@ -1,7 +1,41 @@
+import asyncio
+import tempfile
+from types import SimpleNamespace
+
 import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql
 
+from app.commands import rebuild_course_progress as rebuild_command
+from app.core import config as config_module
 from app.core.security import create_access_token
-from app.models.user import UserRole
+from app.crud import progress as progress_crud
+from app.db import session as session_module
+from app.db.base import Base
+from app.db.deps import get_db
+from app.main import app
+from app.models.course import Course, Lesson
+from app.models.progress import CourseProgress, LessonProgress
+from app.models.user import User, UserRole
+from app.services import digest as digest_service
+from app.services.catalog import get_catalog_cache
+from app.services.principals import get_principal_cache
+from app.services.progress_buffer import DIRTY_KEY, FLUSHING_KEY, ProgressBuffer, get_progress_buffer
+from app.services.redis import get_async_redis
+
+
+@pytest_asyncio.fixture
+async def replica(monkeypatch):
+    monkeypatch.setenv("DATABASE_REPLICA_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/replica.db")
+    config_module.get_settings.cache_clear()
+    session_module.reset_engine()
+    async with session_module.read_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield
+    monkeypatch.delenv("DATABASE_REPLICA_URL")
+    config_module.get_settings.cache_clear()
+    session_module.reset_engine()
 
 
 @pytest.mark.asyncio
@@ -42,6 +76,13 @@ async def test_course_lifecycle(client, user_factory):
         assert res.status_code == 201
         lesson_ids.append(res.json()["id"])
 
+    res = await client.post(
+        "/admin/lessons",
+        json={"course_id": course_id, "index": 2, "title": "Draft", "content_url": "https://cdn/2", "duration_sec": 60},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert res.status_code == 201
+
     res = await client.get("/courses")
     assert res.status_code == 200
     assert res.json()["items"] == []  # guest cannot see member course
@@ -50,7 +91,9 @@ async def test_course_lifecycle(client, user_factory):
         "/courses",
         headers={"Authorization": f"Bearer {learner_token}"},
     )
-    assert len(res.json()["items"]) == 1
+    items = res.json()["items"]
+    assert len(items) == 1
+    assert (items[0]["lessons_count"], items[0]["duration_sec"]) == (2, 120)  # drafts are not counted
 
     res = await client.get(
         "/courses/onboarding",
@@ -67,11 +110,356 @@ async def test_course_lifecycle(client, user_factory):
     )
     assert res.status_code == 200
 
-    # idempotent update
+    # a late, lower heartbeat never moves progress backwards
     progress_body["percent"] = 90
+    progress_body["status"] = "in_progress"
     res = await client.post(
         "/progress/mark",
         json=progress_body,
         headers={"Authorization": f"Bearer {learner_token}"},
     )
     assert res.status_code == 200
+
+    res = await client.get(
+        "/courses/onboarding",
+        headers={"Authorization": f"Bearer {learner_token}"},
+    )
+    detail = res.json()
+    assert detail["progress"] == {"percent": 50}
+    assert [(lesson["status"], lesson["percent"]) for lesson in detail["lessons"]] == [("done", 100), (None, None)]
+
+
+@pytest.mark.asyncio
+async def test_reads_use_replica_until_the_user_writes(client, user_factory, replica, monkeypatch):
+    admin = await user_factory("replica-admin@example.com", "password123", role=UserRole.ADMIN)
+    learner = await user_factory("replica-learner@example.com", "password123")
+    admin_headers = {"Authorization": f"Bearer {create_access_token(str(admin.id))}"}
+    learner_headers = {"Authorization": f"Bearer {create_access_token(str(learner.id))}"}
+
+    res = await client.post(
+        "/admin/courses",
+        json={"title": "Primary", "slug": "primary-only", "visibility": "public"},
+        headers=admin_headers,
+    )
+    course_id = res.json()["id"]
+    res = await client.post(
+        "/admin/lessons",
+        json={"course_id": course_id, "index": 0, "title": "L0", "content_url": "https://cdn/0", "published": True},
+        headers=admin_headers,
+    )
+    lesson_id = res.json()["id"]
+    async with session_module.ReadSessionLocal() as session:
+        session.add(Course(title="Replica", slug="replica-only", visibility="public"))
+        await session.commit()
+
+    primary_sessions = []
+    override_get_db = app.dependency_overrides[get_db]
+
+    async def counting_get_db():
+        primary_sessions.append(1)
+        async for session in override_get_db():
+            yield session
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, counting_get_db)
+    assert (await client.get("/courses/replica-only")).status_code == 200
+    assert (await client.get("/courses/primary-only")).status_code == 404
+    assert (await client.get("/courses/primary-only", headers=learner_headers)).status_code == 404
+    # replica reads resolve the caller without opening a primary session
+    assert primary_sessions == []
+    # the author reads their own write straight away
+    assert (await client.get("/courses/primary-only", headers=admin_headers)).status_code == 200
+
+    res = await client.post(
+        "/progress/mark",
+        json={"lesson_id": lesson_id, "status": "done", "percent": 100},
+        headers=learner_headers,
+    )
+    assert res.status_code == 200
+    res = await client.get("/courses/primary-only", headers=learner_headers)
+    assert res.status_code == 200
+    assert res.json()["progress"]["percent"] == 100
+
+
+@pytest.mark.asyncio
+async def test_principals_read_from_the_replica_are_not_cached(client, user_factory, replica):
+    learner = await user_factory("stale-role@example.com", "password123")
+    async with session_module.ReadSessionLocal() as session:
+        session.add(User(id=learner.id, email=learner.email, password_hash=learner.password_hash, role=UserRole.USER))
+        session.add(Course(title="Members", slug="members-replica", visibility="member"))
+        await session.commit()
+    token = create_access_token(str(learner.id))
+    get_principal_cache().clear()
+
+    res = await client.get("/courses/members-replica", headers={"Authorization": f"Bearer {token}"})
+    assert res.status_code == 403
+    assert len(get_principal_cache()) == 0
+
+
+@pytest.mark.asyncio
+async def test_catalog_is_cached_until_a_write_bumps_the_version(client, user_factory):
+    admin = await user_factory("catalog-admin@example.com", "password123", role=UserRole.ADMIN)
+    admin_headers = {"Authorization": f"Bearer {create_access_token(str(admin.id))}"}
+    cache = get_catalog_cache()
+
+    first = await client.get("/courses", params={"limit": 50})
+    etag = first.headers["ETag"]
+    hits = cache.local_hits.value
+    again = await client.get("/courses", params={"limit": 50})
+    assert again.content == first.content
+    assert cache.local_hits.value == hits + 1
+
+    res = await client.get("/courses", params={"limit": 50}, headers={"If-None-Match": etag})
+    assert res.status_code == 304
+
+    await client.post(
+        "/admin/courses",
+        json={"title": "Fresh", "slug": "fresh", "visibility": "public"},
+        headers=admin_headers,
+    )
+    res = await client.get("/courses", params={"limit": 50}, headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+    assert "fresh" in [item["slug"] for item in res.json()["items"]]
+
+
+@pytest.mark.asyncio
+async def test_progress_batch_is_monotonic(client, user_factory):
+    admin = await user_factory("batch-admin@example.com", "password123", role=UserRole.ADMIN)
+    learner = await user_factory("batch-learner@example.com", "password123")
+    admin_headers = {"Authorization": f"Bearer {create_access_token(str(admin.id))}"}
+    learner_headers = {"Authorization": f"Bearer {create_access_token(str(learner.id))}"}
+    res = await client.post(
+        "/admin/courses",
+        json={"title": "Batch", "slug": "batch", "visibility": "public"},
+        headers=admin_headers,
+    )
+    course_id = res.json()["id"]
+    lesson_ids = []
+    for idx in range(2):
+        res = await client.post(
+            "/admin/lessons",
+            json={"course_id": course_id, "index": idx, "title": f"B{idx}", "content_url": "https://cdn/b", "published": True},
+            headers=admin_headers,
+        )
+        lesson_ids.append(res.json()["id"])
+
+    items = [
+        {"lesson_id": lesson_ids[0], "status": "in_progress", "percent": 40},
+        {"lesson_id": lesson_ids[0], "status": "in_progress", "percent": 30},
+        {"lesson_id": lesson_ids[1], "status": "done", "percent": 100},
+    ]
+    res = await client.post("/progress/batch", json={"items": items}, headers=learner_headers)
+    assert res.json() == {"ok": True, "updated": 2}
+    items = [
+        {"lesson_id": lesson_ids[0], "status": "in_progress", "percent": 20},
+        {"lesson_id": lesson_ids[1], "status": "in_progress", "percent": 10},
+    ]
+    await client.post("/progress/batch", json={"items": items}, headers=learner_headers)
+
+    res = await client.get("/courses/batch", headers=learner_headers)
+    lessons = res.json()["lessons"]
+    assert [(lesson["status"], lesson["percent"]) for lesson in lessons] == [("in_progress", 40), ("done", 100)]
+
+
+@pytest.mark.asyncio
+async def test_postgres_progress_upsert_is_one_statement():
+    class PostgresSession:
+        def __init__(self):
+            self.statements = []
+
+        def get_bind(self):
+            return SimpleNamespace(dialect=postgresql.dialect())
+
+        async def execute(self, stmt):
+            self.statements.append(stmt)
+
+        async def commit(self):
+            pass
+
+    db = PostgresSession()
+    await progress_crud.upsert_progress_rows(db, [{"user_id": 1, "lesson_id": 2, "status": "done", "percent": 100}])
+    assert len(db.statements) == 1
+    sql = " ".join(str(db.statements[0].compile(dialect=postgresql.dialect())).split())
+    assert sql.startswith("WITH changed_progress AS (INSERT INTO progress ")
+    assert "RETURNING progress.user_id, progress.lesson_id, progress.status) INSERT INTO course_progress" in sql
+    assert "ON CONFLICT (user_id, course_id) DO UPDATE" in sql
+    # integer division, like SQLite and the 0004 backfill: 2 of 3 lessons is 66%, not 67%
+    assert "NUMERIC" not in sql
+
+
+@pytest.fixture
+def buffered_progress(monkeypatch):
+    monkeypatch.setenv("PROGRESS_BUFFERED", "true")
+    config_module.get_settings.cache_clear()
+    yield get_progress_buffer()
+    monkeypatch.delenv("PROGRESS_BUFFERED")
+    config_module.get_settings.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_buffered_heartbeats_are_coalesced_and_flushed(client, user_factory, db_session, buffered_progress):
+    admin = await user_factory("buffer-admin@example.com", "password123", role=UserRole.ADMIN)
+    learner = await user_factory("buffer-learner@example.com", "password123")
+    admin_headers = {"Authorization": f"Bearer {create_access_token(str(admin.id))}"}
+    learner_headers = {"Authorization": f"Bearer {create_access_token(str(learner.id))}"}
+    res = await client.post(
+        "/admin/courses",
+        json={"title": "Video", "slug": "video", "visibility": "public"},
+        headers=admin_headers,
+    )
+    res = await client.post(
+        "/admin/lessons",
+        json={"course_id": res.json()["id"], "index": 0, "title": "V0", "content_url": "https://cdn/v", "published": True},
+        headers=admin_headers,
+    )
+    lesson_id = res.json()["id"]
+
+    for percent in (30, 60, 40):
+        res = await client.post(
+            "/progress/mark",
+            json={"lesson_id": lesson_id, "status": "in_progress", "percent": percent},
+            headers=learner_headers,
+        )
+        assert res.status_code == 200
+    stored = select(LessonProgress).where(LessonProgress.user_id == learner.id)
+    assert (await db_session.scalars(stored)).all() == []
+
+    res = await client.get("/courses/video", headers=learner_headers)
+    assert [(lesson["status"], lesson["percent"]) for lesson in res.json()["lessons"]] == [("in_progress", 60)]
+
+    try:
+        assert await buffered_progress.flush() == 1
+    finally:
+        await buffered_progress.close()
+    row = (await db_session.scalars(stored)).one()
+    assert (row.status, row.percent) == ("in_progress", 60)
+    assert await buffered_progress.pending(learner.id) == {}
+
+
+@pytest.mark.asyncio
+async def test_buffered_progress_survives_a_flusher_dying_mid_flush(user_factory, db_session, monkeypatch):
+    learner = await user_factory("crash-learner@example.com", "password123")
+    course = Course(title="Crash", slug="crash-course", visibility="public")
+    db_session.add(course)
+    await db_session.flush()
+    lesson = Lesson(course_id=course.id, index=0, title="C0", content_url="https://cdn/c", published=True)
+    db_session.add(lesson)
+    await db_session.commit()
+
+    crashing = ProgressBuffer(flush_interval=60, max_users=10, claim_timeout=60)
+    await crashing.record(learner.id, [(lesson.id, "done", 100)])
+
+    async def killed(snapshots):
+        raise asyncio.CancelledError  # the process dies between claim and write
+
+    monkeypatch.setattr(crashing, "_write", killed)
+    with pytest.raises(asyncio.CancelledError):
+        await crashing.flush()
+    crashing._task.cancel()
+    redis = get_async_redis()
+    assert not await redis.sismember(DIRTY_KEY, learner.id)
+    assert await redis.zscore(FLUSHING_KEY, learner.id) is not None
+
+    # a fresh flusher on the default timeout leaves the recent claim alone...
+    assert await ProgressBuffer(flush_interval=60, max_users=10, claim_timeout=60).recover() == 0
+    # ...and recovers it once the claim is stale
+    successor = ProgressBuffer(flush_interval=60, max_users=10, claim_timeout=0)
+    assert await successor.flush() >= 1
+    stored = select(LessonProgress).where(LessonProgress.user_id == learner.id)
+    row = (await db_session.scalars(stored)).one()
+    assert (row.status, row.percent) == ("done", 100)
+    assert await redis.zscore(FLUSHING_KEY, learner.id) is None
+    assert await successor.pending(learner.id) == {}
+
+
+@pytest.mark.asyncio
+async def test_my_courses_dashboard_tracks_progress_and_publishing(client, user_factory, db_session):
+    admin = await user_factory("dash-admin@example.com", "password123", role=UserRole.ADMIN)
+    learner = await user_factory("dash-learner@example.com", "password123")
+    admin_headers = {"Authorization": f"Bearer {create_access_token(str(admin.id))}"}
+    learner_headers = {"Authorization": f"Bearer {create_access_token(str(learner.id))}"}
+    res = await client.post(
+        "/admin/courses",
+        json={"title": "Dash", "slug": "dash", "visibility": "public"},
+        headers=admin_headers,
+    )
+    course_id = res.json()["id"]
+
+    async def add_lesson(index: int) -> int:
+        res = await client.post(
+            "/admin/lessons",
+            json={"course_id": course_id, "index": index, "title": f"D{index}", "content_url": "https://cdn/d", "published": True},
+            headers=admin_headers,
+        )
+        return res.json()["id"]
+
+    first, second = await add_lesson(0), await add_lesson(1)
+    await client.post(
+        "/progress/batch",
+        json={"items": [
+            {"lesson_id": first, "status": "done", "percent": 100},
+            {"lesson_id": second, "status": "in_progress", "percent": 50},
+        ]},
+        headers=learner_headers,
+    )
+    res = await client.get("/me/courses", headers=learner_headers)
+    [entry] = res.json()
+    assert (entry["course"]["slug"], entry["completed"], entry["total"], entry["percent"]) == ("dash", 1, 2, 50)
+
+    await add_lesson(2)
+    await add_lesson(3)
+    [entry] = (await client.get("/me/courses", headers=learner_headers)).json()
+    assert (entry["completed"], entry["total"], entry["percent"]) == (1, 4, 25)
+
+    await db_session.execute(delete(CourseProgress))
+    await db_session.commit()
+    # the rebuild command also repairs drifted published totals
+    course = await db_session.get(Course, course_id)
+    course.published_lessons_count = 9
+    await db_session.commit()
+    await rebuild_command.rebuild([course_id])
+    [entry] = (await client.get("/me/courses", headers=learner_headers)).json()
+    assert (entry["completed"], entry["total"], entry["percent"]) == (1, 4, 25)
+
+    # repeated or late heartbeats on a completed lesson are not counted again
+    await client.post(
+        "/progress/batch",
+        json={"items": [
+            {"lesson_id": first, "status": "done", "percent": 100},
+            {"lesson_id": first, "status": "in_progress", "percent": 10},
+            {"lesson_id": second, "status": "done", "percent": 90},
+        ]},
+        headers=learner_headers,
+    )
+    [entry] = (await client.get("/me/courses", headers=learner_headers)).json()
+    assert (entry["completed"], entry["total"], entry["percent"]) == (2, 4, 50)
+
+
+@pytest.mark.asyncio
+async def test_weekly_digest_batches_and_resumes(user_factory, db_session, monkeypatch):
+    course = Course(title="Digest course", slug="digest-course", visibility="public", published_lessons_count=4)
+    db_session.add(course)
+    await db_session.commit()
+    learners = [await user_factory(f"digest{i}@example.com", "password123") for i in range(3)]
+    for index, learner in enumerate(learners):
+        db_session.add(CourseProgress(user_id=learner.id, course_id=course.id, completed=index, total=4, percent=index * 25))
+    await db_session.commit()
+
+    sent = []
+
+    async def capture(jobs):
+        jobs = list(jobs)
+        sent.extend(jobs)
+        return len(jobs)
+
+    monkeypatch.setattr(digest_service, "enqueue_emails", capture)
+    first = await digest_service.run_weekly_digest(week="test-week", batch_size=2)
+    digests = {to: body for to, _, body in sent if to.startswith("digest")}
+    assert sorted(digests) == ["digest0@example.com", "digest1@example.com", "digest2@example.com"]
+    assert "Digest course - 50%" in digests["digest2@example.com"]
+
+    sent.clear()
+    again = await digest_service.run_weekly_digest(week="test-week", batch_size=2)
+    assert again.resumed_after == learners[-1].id
+    assert (again.users_scanned, sent) == (0, [])
+    assert first.emails_enqueued >= 3
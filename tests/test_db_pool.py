@@ -0,0 +1,50 @@
+import tempfile
+
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import Settings
+from app.db.pool import InstrumentedAsyncPool, checkout_timeouts, checkout_wait_ms, overflow_events
+from app.db.session import _engine_options
+
+
+def test_engine_options_follow_settings(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgresql+asyncpg://app:app@db:6432/app")
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_PGBOUNCER", "true")
+    settings = Settings()
+    options = _engine_options(settings, settings.database_url)
+    assert options["poolclass"] is InstrumentedAsyncPool
+    assert options["pool_size"] == 3
+    connect_args = options["connect_args"]
+    assert connect_args["statement_cache_size"] == 0
+    assert connect_args["prepared_statement_cache_size"] == 0
+    assert connect_args["prepared_statement_name_func"]() != connect_args["prepared_statement_name_func"]()
+
+    assert _engine_options(settings, "sqlite+aiosqlite:///app.db") == {}
+
+
+@pytest.mark.asyncio
+async def test_pool_records_waits_overflow_and_timeouts():
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/pool.db",
+        poolclass=InstrumentedAsyncPool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05,
+    )
+    waits, overflows, timeouts = checkout_wait_ms.count, overflow_events.value, checkout_timeouts.value
+    try:
+        async with engine.connect() as first, engine.connect() as second:
+            await first.execute(text("SELECT 1"))
+            await second.execute(text("SELECT 1"))
+            assert engine.pool.checkedout() == 2
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+    finally:
+        await engine.dispose()
+    assert checkout_wait_ms.count - waits == 3
+    assert overflow_events.value - overflows == 1
+    assert checkout_timeouts.value - timeouts == 1
@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.security import create_access_token
 from app.models.user import UserRole
+from app.services.principals import get_principal_cache
 
 
 @pytest.mark.asyncio
@@ -31,3 +32,40 @@ async def test_invite_flow(client, user_factory, db_session: AsyncSession):
     assert res.status_code == 200
     await db_session.refresh(user)
     assert user.role == UserRole.MEMBER
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_invalidated_on_redeem(client, user_factory):
+    admin = await user_factory("cache-admin@example.com", "password123", role=UserRole.ADMIN)
+    user = await user_factory("cache-user@example.com", "password123", role=UserRole.USER)
+    admin_headers = {"Authorization": f"Bearer {create_access_token(str(admin.id))}"}
+    user_headers = {"Authorization": f"Bearer {create_access_token(str(user.id))}"}
+
+    res = await client.post(
+        "/admin/courses",
+        json={"title": "Members", "slug": "members-only", "visibility": "member"},
+        headers=admin_headers,
+    )
+    assert res.status_code == 201
+
+    hits = get_principal_cache().hits.value
+    res = await client.get("/courses", params={"visibility": "member"}, headers=user_headers)
+    assert res.status_code == 200
+    res = await client.get("/courses", headers=user_headers)
+    assert all(item["slug"] != "members-only" for item in res.json()["items"])
+    assert get_principal_cache().hits.value > hits
+
+    expires = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    res = await client.post(
+        "/admin/invites",
+        json={"role_to_grant": "member", "expires_at": expires},
+        headers=admin_headers,
+    )
+    res = await client.post("/invites/redeem", json={"code": res.json()["code"]}, headers=user_headers)
+    assert res.status_code == 200
+
+    res = await client.get("/courses", headers=user_headers)
+    assert any(item["slug"] == "members-only" for item in res.json()["items"])
+
+    res = await client.get("/admin/metrics", headers=admin_headers)
+    assert res.json()["counters"]["principal_cache.hits"] >= 1
@@ -0,0 +1,153 @@
+import json
+import smtplib
+import socket
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.handlers import Sink
+import pytest
+
+from app.core import config as config_module
+from app.services.notifications import render_many, render_template, warm_templates
+from app.services.redis import get_redis
+from app.services.smtp_pool import SMTPConnectionPool
+from app.services.tasks import EMAIL_QUEUE_KEY, encode_email_job, enqueue_emails
+from app.workers import email as email_worker
+
+
+class CountingSink(Sink):
+    def __init__(self):
+        self.messages = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return "250 OK"
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("nobody@"):
+            return "550 no such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_server():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = CountingSink()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+def test_pool_reuses_recycles_and_reconnects(smtp_server):
+    controller, handler = smtp_server
+    pool = SMTPConnectionPool(controller.hostname, controller.port, max_size=2, max_messages=3)
+    connects = pool.connects.value
+    try:
+        for _ in range(3):
+            pool.send("noreply@example.com", ["a@example.com"], "Subject: hi\n\nbody")
+        # the fourth message needs a fresh connection: the first one hit max_messages
+        pool.send("noreply@example.com", ["a@example.com"], "Subject: hi\n\nbody")
+        assert pool.connects.value - connects == 2
+
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            pool.send("noreply@example.com", ["nobody@example.com"], "Subject: hi\n\nbody")
+        assert len(pool._idle) == 1  # a refused recipient keeps the connection
+
+        pool._idle[0].smtp.close()  # the relay dropped the idle connection
+        reconnects = pool.reconnects.value
+        pool.send("noreply@example.com", ["a@example.com"], "Subject: hi\n\nbody")
+        assert pool.reconnects.value == reconnects + 1
+    finally:
+        pool.close()
+    assert handler.messages == 5
+
+
+@pytest.mark.asyncio
+async def test_json_email_queue_round_trip(monkeypatch):
+    monkeypatch.setenv("EMAIL_QUEUE_BACKEND", "redis_list")
+    config_module.get_settings.cache_clear()
+    sent = []
+    monkeypatch.setattr(email_worker, "send_email", lambda *args: sent.append(args))
+    try:
+        assert await enqueue_emails([(f"user{i}@example.com", "Digest", "<p>hi</p>") for i in range(3)]) == 3
+    finally:
+        monkeypatch.delenv("EMAIL_QUEUE_BACKEND")
+        config_module.get_settings.cache_clear()
+
+    redis = get_redis()
+    worker = email_worker.EmailWorker(redis, name="test")
+    redis.rpush(worker.processing_key, encode_email_job("stuck@example.com", "Digest", "<p>hi</p>"))
+    assert worker.recover() == 1
+    while (raw := redis.lmove(EMAIL_QUEUE_KEY, worker.processing_key, "RIGHT", "LEFT")) is not None:
+        worker.process(raw)
+
+    # recovered jobs are the oldest, so they go out first
+    assert [to for to, _, _ in sent] == ["stuck@example.com", "user0@example.com", "user1@example.com", "user2@example.com"]
+    assert redis.llen(worker.processing_key) == 0
+
+
+def test_failed_email_jobs_back_off_and_names_are_exclusive(monkeypatch):
+    def smtp_down(*args):
+        raise OSError("relay unreachable")
+
+    monkeypatch.setattr(email_worker, "send_email", smtp_down)
+    redis = get_redis()
+    worker = email_worker.EmailWorker(redis, name="backoff", retry_base_delay=60)
+    raw = encode_email_job("retry@example.com", "Digest", "<p>hi</p>")
+    redis.rpush(worker.processing_key, raw)
+    worker.process(raw)
+    # parked until the backoff elapses instead of going straight back on the queue
+    assert redis.llen(worker.processing_key) == 0
+    assert redis.zcard(email_worker.DELAYED_KEY) == 1
+    assert worker.promote_due() == 0
+
+    redis.zadd(email_worker.DELAYED_KEY, {member: 0 for member in redis.zrange(email_worker.DELAYED_KEY, 0, -1)})
+    assert worker.promote_due() == 1
+    retried = redis.rpop(EMAIL_QUEUE_KEY)
+    assert json.loads(retried)["attempts"] == 1
+
+    worker.acquire_name()
+    twin = email_worker.EmailWorker(redis, name="backoff")
+    twin.stop()
+    twin.acquire_name()  # gives up on stop instead of taking a live worker's name
+    assert redis.get(worker.lease_key) == worker._lease_token
+    twin.release_name()
+    worker.release_name()
+    assert redis.get(worker.lease_key) is None
+
+
+
+def test_lost_worker_name_stops_the_worker(monkeypatch):
+    monkeypatch.setattr(email_worker, "LEASE_TTL_SECONDS", 0.03)
+    redis = get_redis()
+    worker = email_worker.EmailWorker(redis, name="lease")
+    redis.set(worker.lease_key, worker._lease_token, px=30)
+    renew = worker._renew
+    calls = []
+
+    def flaky_renew(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise ConnectionError("redis restarting")
+        if len(calls) == 2:
+            return renew(**kwargs)
+        redis.set(worker.lease_key, "someone-else")
+        return renew(**kwargs)
+
+    monkeypatch.setattr(worker, "_renew", flaky_renew)
+    worker._keep_name()  # returns once the lease is lost
+    assert len(calls) == 3
+    assert worker._stop.is_set()
+    worker.release_name()  # never drops a lease held by another worker
+    assert redis.get(worker.lease_key) == "someone-else"
+
+
+def test_render_many_matches_single_renders():
+    assert warm_templates() >= 3
+    contexts = [{"courses": [{"title": f"Course {i}", "progress": i * 10}]} for i in range(3)]
+    rendered = list(render_many("weekly_digest.html", contexts))
+    assert rendered == [render_template("weekly_digest.html", context) for context in contexts]
+    assert "Course 2 - 20%" in rendered[2]
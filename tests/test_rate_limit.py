@@ -0,0 +1,87 @@
+import fakeredis
+import pytest
+
+from app.utils.rate_limit import LocalRateLimitTier, RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_refill_and_retry_after():
+    limiter = RateLimiter(fakeredis.aioredis.FakeRedis(decode_responses=True), algorithm="token_bucket")
+
+    results = [await limiter.check("tb", limit=3, window_seconds=60) for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert results[2].remaining == 0
+    # one token refills every 20s
+    assert 19 < results[3].retry_after <= 20
+    assert results[3].reset_after <= 60
+
+
+@pytest.mark.asyncio
+async def test_sliding_log_counts_trailing_window():
+    redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    limiter = RateLimiter(redis, algorithm="sliding_log")
+
+    first = await limiter.check("sl", limit=2, window_seconds=10)
+    second = await limiter.check("sl", limit=2, window_seconds=10)
+    denied = await limiter.check("sl", limit=2, window_seconds=10)
+    assert (first.allowed, second.allowed, denied.allowed) == (True, True, False)
+    assert (first.remaining, second.remaining, denied.remaining) == (1, 0, 0)
+    assert 9 < denied.retry_after <= 10
+    assert await redis.zcard("rl:sliding_log:sl") == 2
+    assert 0 < await redis.pttl("rl:sliding_log:sl") <= 10_000
+
+    oversized = await limiter.check("empty", limit=2, window_seconds=10, cost=3)
+    assert (oversized.allowed, oversized.remaining, oversized.retry_after) == (False, 2, 10)
+    assert await redis.exists("rl:sliding_log:empty") == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_headers(client):
+    payload = {"email": "headers@example.com", "password": "supersecret"}
+    res = await client.post("/auth/login", json=payload)
+    assert res.status_code == 401
+    res = await client.post("/auth/register", json=payload)
+    assert res.status_code == 201
+    assert res.headers["RateLimit-Limit"] == "5"
+    assert res.headers["RateLimit-Remaining"] == "4"
+
+    for _ in range(4):
+        await client.post("/auth/register", json=payload)
+    res = await client.post("/auth/register", json=payload)
+    assert res.status_code == 429
+    assert res.headers["RateLimit-Remaining"] == "0"
+    assert 0 < int(res.headers["Retry-After"]) <= 3600
+    assert res.json()["detail"]["retry_after"] == int(res.headers["Retry-After"])
+
+
+@pytest.mark.asyncio
+async def test_local_tier_leases_and_blocks_without_redis():
+    limiter = RateLimiter(fakeredis.aioredis.FakeRedis(decode_responses=True))
+    tier = LocalRateLimitTier(max_keys=100, lease_size=5, lease_ttl=30)
+
+    assert tier.check("hot", limit=50) is None
+    # the first hit is cold: no lease, so sparse traffic never burns quota
+    result = await limiter.check("hot", limit=50, window_seconds=60, lease=tier.lease_for("hot", 50))
+    tier.record("hot", result)
+    assert result.leased == 0 and result.remaining == 49
+    assert tier.check("hot", limit=50) is None
+    result = await limiter.check("hot", limit=50, window_seconds=60, lease=tier.lease_for("hot", 50))
+    tier.record("hot", result)
+    assert result.leased == 5 and result.remaining == 43
+
+    local = [tier.check("hot", limit=50) for _ in range(5)]
+    assert all(r is not None and r.allowed for r in local)
+    assert {r.remaining for r in local} == {43}
+    assert tier.check("hot", limit=50) is None
+
+    sparse = LocalRateLimitTier(max_keys=100, lease_size=5, lease_ttl=0)
+    for _ in range(3):
+        lease = sparse.lease_for("sparse", 50)
+        sparse.record("sparse", await limiter.check("sparse", limit=50, window_seconds=60, lease=lease))
+    assert (await limiter.check("sparse", limit=50, window_seconds=60)).remaining == 46
+
+    for _ in range(2):
+        tier.record("tight", await limiter.check("tight", limit=1, window_seconds=60, lease=tier.lease_for("tight", 1)))
+    blocked = tier.check("tight", limit=1)
+    assert blocked is not None and not blocked.allowed
+    assert 59 < blocked.retry_after <= 60
@@ -3,6 +3,8 @@ from datetime import timedelta
 import pytest
 
 from app.core.security import create_access_token
+from app.models.course import Course, Lesson
+from app.models.user import UserRole
 from app.services import storage as storage_service
 
 
@@ -10,7 +12,7 @@ class DummyMinio:
     def __init__(self):
         self.calls = []
 
-    def get_presigned_url(self, method, bucket_name, object_name, expires):
+    def get_presigned_url(self, method, bucket_name, object_name, expires, request_date=None):
         self.calls.append((method, bucket_name, object_name, expires))
         return f"https://example.com/{object_name}?token=fake"
 
@@ -21,6 +23,7 @@ async def test_signed_url_generation(client, user_factory, monkeypatch):
     token = create_access_token(str(user.id))
     dummy = DummyMinio()
     monkeypatch.setattr(storage_service, "_client", dummy)
+    storage_service.get_presigned_url_cache().clear()
 
     res = await client.get(
         "/storage/sign",
@@ -33,3 +36,81 @@ async def test_signed_url_generation(client, user_factory, monkeypatch):
     _, _, key, expires = dummy.calls[0]
     assert key == "lesson/video.mp4"
     assert isinstance(expires, timedelta)
+
+
+def test_presigned_urls_shared_within_bucket_and_signed_locally(monkeypatch):
+    dummy = DummyMinio()
+    monkeypatch.setattr(storage_service, "_client", dummy)
+    cache = storage_service.PresignedUrlCache(max_size=2, bucket_seconds=60)
+    monkeypatch.setattr(storage_service.time, "time", lambda: 6000.0)
+
+    first = cache.get("a.mp4", timedelta(minutes=5))
+    assert cache.get("a.mp4", timedelta(minutes=5)) == first
+    assert len(dummy.calls) == 1
+    assert dummy.calls[0][3] == timedelta(minutes=6)
+
+    monkeypatch.setattr(storage_service.time, "time", lambda: 6060.0)
+    cache.get("a.mp4", timedelta(minutes=5))
+    assert len(dummy.calls) == 2
+
+    # a real client with a configured region signs without touching the network
+    real = storage_service.Minio("unreachable.invalid:9000", "ak", "sk", secure=False, region="us-east-1")
+    monkeypatch.setattr(storage_service, "_client", real)
+    url = cache.get("b.mp4", timedelta(minutes=5))
+    assert "X-Amz-Date=19700101T014100Z" in url and "X-Amz-Expires=360" in url
+
+
+@pytest.mark.asyncio
+async def test_sign_batch_checks_course_once(client, user_factory, db_session, monkeypatch):
+    user = await user_factory("batch@example.com", "password123")
+    member = await user_factory("batch-member@example.com", "password123", role=UserRole.MEMBER)
+    headers = {"Authorization": f"Bearer {create_access_token(str(user.id))}"}
+    member_headers = {"Authorization": f"Bearer {create_access_token(str(member.id))}"}
+    dummy = DummyMinio()
+    monkeypatch.setattr(storage_service, "_client", dummy)
+    storage_service.get_presigned_url_cache().clear()
+
+    open_course = Course(title="Open", slug="sign-open", visibility="public", cover_url="covers/open.png")
+    closed_course = Course(title="Closed", slug="sign-closed", visibility="member")
+    db_session.add_all([open_course, closed_course])
+    await db_session.flush()
+    db_session.add_all(
+        [
+            Lesson(course_id=open_course.id, index=i, title=f"L{i}", content_url=f"open/{i}.mp4", published=True)
+            for i in range(3)
+        ]
+        + [
+            Lesson(course_id=open_course.id, index=9, title="Draft", content_url="open/draft.mp4", published=False),
+            Lesson(course_id=closed_course.id, index=0, title="M", content_url="closed/0.mp4", published=True),
+        ]
+    )
+    await db_session.commit()
+
+    keys = ["open/0.mp4", "open/1.mp4", "open/2.mp4", "covers/open.png", "open/0.mp4"]
+    res = await client.post("/storage/sign-batch", json={"course_slug": "sign-open", "keys": keys}, headers=headers)
+    assert res.status_code == 200
+    assert sorted(res.json()["urls"]) == sorted(set(keys))
+    assert len(dummy.calls) == 4
+
+    res = await client.post(
+        "/storage/sign-batch", json={"course_slug": "sign-open", "keys": ["open/draft.mp4"]}, headers=headers
+    )
+    assert res.status_code == 404
+    res = await client.post(
+        "/storage/sign-batch", json={"course_slug": "sign-closed", "keys": ["closed/0.mp4"]}, headers=headers
+    )
+    assert res.status_code == 403
+    res = await client.post(
+        "/storage/sign-batch", json={"course_slug": "sign-closed", "keys": ["closed/0.mp4"]}, headers=member_headers
+    )
+    assert res.status_code == 200
+
+    res = await client.get("/courses/sign-open", params={"signed_urls": "true"}, headers=headers)
+    assert res.status_code == 200
+    body = res.json()
+    assert body["cover_signed_url"].startswith("https://example.com/covers/open.png")
+    assert [lesson["signed_url"] for lesson in body["lessons"]] == [
+        f"https://example.com/open/{i}.mp4?token=fake" for i in range(3)
+    ]
+    assert len(dummy.calls) == 5  # reused the batch's signatures
+    assert (await client.get("/courses/sign-open", params={"signed_urls": "true"})).status_code == 401